@@ -1,10 +1,13 @@
-from llm.llm import Session, FunctionCaller, SafetyControls
+from llm.llm import Session, FunctionCaller, SafetyControls, ToolDispatcher
 from typing import List
-from llm.interfaces import ToolCallResult, LLMProvider
+from llm.interfaces import LLMProvider
 from typing import Union, Callable, Any
 from llm.openai import OpenAIProvider
 from llm.ollama import OllamaProvider
-import json
+from llm.dispatch import ChatDispatcher, ChatTarget, DEFAULT_HEDGE_AFTER
+from tools.profiling import profiler
+from tools.output_encoder import output_encoder
+from tools.run_python_code import python_repl
 
 class Agent:
     DEFAULT_MODELS = {
@@ -29,6 +32,7 @@ class Agent:
         tools: Any,
         provider: LLMProvider,
         tool_use_behavior: Union[str, List[str], Callable[[str, Any], bool]] = "run_llm_again",
+        provider_name: str = None,
     ):
         self.client = client
         self.session = session
@@ -37,9 +41,15 @@ class Agent:
         self.tools = tools
         self.tool_use_behavior = tool_use_behavior
         self.provider = provider
+        # Providers are told apart by name: openai and groq share a provider class
+        self.provider_name = provider_name or next(
+            (name for name, instance in self.PROVIDERS.items() if type(instance) is type(provider)), None
+        )
         self.model = model
-        
-    def switch_provider(self, new_provider):
+        self.chat_dispatcher = ChatDispatcher()
+        self.profile_turns = True
+
+    def build_client(self, new_provider):
         if new_provider not in self.DEFAULT_MODELS:
             raise ValueError(f"Unsupported provider: {new_provider}")
         if new_provider not in self.PROVIDERS:
@@ -58,7 +68,12 @@ class Agent:
         else:
             raise ValueError(f"No client builder defined for provider: {new_provider}")
 
-        self.provider = new_provider
+        return provider_instance, client
+        
+    def switch_provider(self, new_provider):
+        provider_instance, client = self.build_client(new_provider)
+
+        self.provider_name = new_provider
         self.model = self.DEFAULT_MODELS[new_provider]
         self.client = client
         self.provider = provider_instance
@@ -67,9 +82,47 @@ class Agent:
 
     def set_model(self, model_name):
         self.model = model_name
+
+    def spawn(self, ui):
+        """Return an agent with the same model settings but its own session and REPL namespace."""
+        session = Session(
+            system_prompt=self.session.messages[0]["content"],
+            max_iterations=self.session.max_iterations,
+            provider=self.session.provider
+        )
+        agent = Agent(
+            client=self.client,
+            session=session,
+            model=self.model,
+            function_caller=FunctionCaller(python_repl()),
+            safety_controls=SafetyControls(ui),
+            tools=self.tools,
+            provider=self.provider,
+            tool_use_behavior=self.tool_use_behavior,
+            provider_name=self.provider_name,
+        )
+        agent.chat_dispatcher.timeout = self.chat_dispatcher.timeout
+        agent.chat_dispatcher.set_hedge(self.chat_dispatcher.hedge, self.chat_dispatcher.hedge_after)
+        # Turn reports only make sense for the foreground conversation
+        agent.profile_turns = False
+        return agent
+
+    def set_hedge(self, hedge_provider, hedge_after=DEFAULT_HEDGE_AFTER):
+        if hedge_provider is None:
+            self.chat_dispatcher.set_hedge(None)
+            return
+
+        if hedge_provider == self.provider_name:
+            raise ValueError(f"'{hedge_provider}' is already the primary provider")
+        provider_instance, client = self.build_client(hedge_provider)
+        target = ChatTarget(hedge_provider, provider_instance, client, self.DEFAULT_MODELS[hedge_provider])
+        self.chat_dispatcher.set_hedge(target, hedge_after)
         
     def run(self, user_input: str):
         self.session.add_message("user", user_input)
+        if profiler.enabled and self.profile_turns:
+            with profiler.turn(user_input):
+                return self.agentic_loop()
         return self.agentic_loop()
     
     def should_stop_after_tool(self, tool_name: str, tool_result: Any) -> bool:
@@ -87,43 +140,36 @@ class Agent:
 
         while current_iteration < MAX_ITERATIONS:
             current_provider_instance = self.session.provider
-            message = current_provider_instance.chat(
-                client=self.client,
-                model=self.model,
-                messages=self.session.messages,
-                tools=self.tools
-            )
-
-            self.session.messages.append(message)
-
-            # If there are tool calls, process them and continue the loop
-            if getattr(message, "tool_calls", None):
-                for tool in message.tool_calls:
-                    name = tool.function.name
-                    args = tool.function.arguments
-
-                    if isinstance(args, str):
-                        try:
-                            args = json.loads(args)
-                        except json.JSONDecodeError:
-                            print(f"Invalid JSON in arguments: {args}")
-
-                    if not self.safety_controls.check(args):
+            dispatcher = ToolDispatcher(self.function_caller, self.safety_controls)
+
+            try:
+                # Tool calls start executing while the rest of the message streams in
+                message, responder = self.chat_dispatcher.chat(
+                    primary=ChatTarget(self.provider_name, current_provider_instance, self.client, self.model),
+                    messages=self.session.messages,
+                    tools=self.tools,
+                    on_tool_call=dispatcher.submit
+                )
+
+                self.session.add_assistant_message(message, provider=responder.provider)
+
+                # If there are tool calls, collect their results and continue the loop
+                if getattr(message, "tool_calls", None):
+                    for tool_result in dispatcher.results():
+                        # Compact tables and timestamps cost the model far fewer tokens than raw reprs
+                        tool_result.result = output_encoder.encode(str(tool_result.result))
+                        self.session.add_tool_response(tool_result, provider=responder.provider)
+
+                    if dispatcher.aborted:
                         return
-
-                    result = self.function_caller.call(name, args)
-                    tool_result = ToolCallResult(
-                        result=result,
-                        tool_call_id=getattr(tool, 'id', None),
-                        tool_name=name
-                    )
-                    self.session.add_tool_response(tool_result)
-                # Continue to next iteration after handling tool calls
-
-            else:
-                # No tool calls: this is the final answer, so exit the loop
-                # Do NOT print again, just return for programmatic use
-                return (message.content.strip(), "green")
+                    # Continue to next iteration after handling tool calls
+
+                else:
+                    # No tool calls: this is the final answer, so exit the loop
+                    # Do NOT print again, just return for programmatic use
+                    return (message.content.strip(), "green")
+            finally:
+                dispatcher.close()
 
             current_iteration += 1
 
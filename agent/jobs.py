@@ -0,0 +1,147 @@
+import itertools
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_MAX_JOBS = int(os.environ.get("CLOUD_CLI_MAX_JOBS", 3))
+CONFIRMATION_POLL_INTERVAL = 0.5
+
+
+class Job:
+    def __init__(self, job_id: int, query: str):
+        self.id = job_id
+        self.query = query
+        self.status = "queued"
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.result: Optional[str] = None
+        self.style = "green"
+        self.tool_calls = 0
+        self.messages: List[tuple] = []
+
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+
+class ConfirmationRequest:
+    def __init__(self, job: Job, resource_name: str):
+        self.job = job
+        self.resource_name = resource_name
+        self.answer: Optional[str] = None
+        self.answered = threading.Event()
+
+
+class JobConfirmations:
+    """Stands in for the UI given to a background job's SafetyControls.
+
+    Confirmations are queued for the foreground prompt to ask in order, and
+    messages are kept on the job instead of being printed over the prompt.
+    """
+
+    def __init__(self, job: Job, manager: "JobManager"):
+        self.job = job
+        self.manager = manager
+
+    def confirm_modification(self, resource_name: str) -> str:
+        request = ConfirmationRequest(self.job, resource_name)
+        self.job.status = "awaiting confirmation"
+        self.manager.request_confirmation(request)
+        # Wake up now and then so a shutdown is never stuck behind an unanswered prompt
+        while not request.answered.wait(CONFIRMATION_POLL_INTERVAL):
+            if self.manager.stopping.is_set():
+                request.answer = "3"
+                break
+        self.job.status = "running"
+        return request.answer
+
+    def display_message(self, message: str, color: str = "grey"):
+        self.job.messages.append((message, color))
+
+
+class JobManager:
+    """Runs questions in the background, each with its own agent, session and REPL namespace."""
+
+    def __init__(self, spawn_agent: Callable, max_jobs: int = DEFAULT_MAX_JOBS, on_confirmation: Optional[Callable] = None):
+        # spawn_agent(ui) -> Agent whose SafetyControls report through `ui`
+        self.spawn_agent = spawn_agent
+        self.max_jobs = max_jobs
+        # Called from the job's thread when a confirmation is queued, e.g. to wake the prompt
+        self.on_confirmation = on_confirmation
+        # Jobs run on daemon threads, so exiting never waits for an investigation to finish
+        self.slots = threading.Semaphore(max_jobs)
+        self.jobs: Dict[int, Job] = {}
+        self.ids = itertools.count(1)
+        self.confirmations: queue.Queue = queue.Queue()
+        self.stopping = threading.Event()
+
+    def submit(self, query: str) -> Job:
+        job = Job(next(self.ids), query)
+        self.jobs[job.id] = job
+        threading.Thread(target=self.run_job, args=(job,), name=f"job-{job.id}", daemon=True).start()
+        return job
+
+    def run_job(self, job: Job):
+        with self.slots:
+            if self.stopping.is_set():
+                return
+            self.run_agent(job)
+
+    def run_agent(self, job: Job):
+        job.status = "running"
+        job.started = time.time()
+        try:
+            agent = self.spawn_agent(JobConfirmations(job, self))
+            agent.function_caller.add_listener(lambda name, args, result: self.count_tool_call(job))
+            outcome = agent.run(job.query)
+            if outcome is None:
+                job.result, job.style, job.status = "Aborted at a confirmation prompt.", "red", "aborted"
+            else:
+                job.result, job.style = outcome
+                job.status = "done"
+        except Exception as e:
+            job.result, job.style, job.status = f"Error: {str(e)}", "red", "failed"
+        finally:
+            job.finished = time.time()
+
+    @staticmethod
+    def count_tool_call(job: Job):
+        job.tool_calls += 1
+
+    def request_confirmation(self, request: ConfirmationRequest):
+        self.confirmations.put(request)
+        if self.on_confirmation:
+            self.on_confirmation()
+
+    def next_confirmation(self) -> Optional[ConfirmationRequest]:
+        try:
+            return self.confirmations.get_nowait()
+        except queue.Empty:
+            return None
+
+    def shutdown(self) -> List[Job]:
+        """Decline pending confirmations, drop queued jobs and return the running jobs left behind."""
+        self.stopping.set()
+        while True:
+            request = self.next_confirmation()
+            if request is None:
+                break
+            request.answer = "3"
+            request.answered.set()
+        for job in self.jobs.values():
+            if job.status == "queued":
+                job.status = "cancelled"
+        return [job for job in self.jobs.values() if job.started is not None and job.finished is None]
+
+    def get(self, job_id: int) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def summary(self) -> str:
+        counts = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return ", ".join(f"{count} {status}" for status, count in counts.items())
@@ -1,19 +1,51 @@
+import difflib
+import time
+from datetime import datetime
 from rich.console import Console
 from prompt_toolkit.styles import Style
 from ui.ui import UI
 from agent.agent import Agent
+from agent.jobs import JobManager
+from llm.dispatch import DEFAULT_HEDGE_AFTER
+from tools.aws_rate_limiter import aws_rate_limiter
+from tools.output_encoder import output_encoder
+from tools.namespace_memory import format_bytes
+from tools.profiling import profiler
 
 class CloudCLI:
+    DEFAULT_WATCH_INTERVAL = 10
+    # Each tick calls the AWS API, so keep polling at least this far apart
+    MIN_WATCH_INTERVAL = 1
+    # The timeout bounds the wait for each chunk, so anything shorter fails every request
+    MIN_TIMEOUT = 1
+    STATS_RECENT_CALLS = 20
+
     def __init__(self, agent: Agent, ui: UI):
         self.agent = agent
         self.ui = ui
+        self.last_watch = None
+        # A queued job confirmation ends the current prompt so it is asked right away
+        self.jobs = JobManager(agent.spawn, on_confirmation=ui.interrupt_input)
 
     def run(self):
         self.ui.display_welcome()
+        try:
+            self.loop()
+        finally:
+            abandoned = self.jobs.shutdown()
+            if abandoned:
+                ids = ", ".join(f"#{job.id}" for job in abandoned)
+                self.ui.display_message(f"Abandoning unfinished background jobs: {ids}", "yellow")
 
+    def loop(self):
         while True:
             try:
-                user_input = self.ui.get_user_input()
+                self.answer_job_confirmations()
+                user_input = self.ui.get_user_input(
+                    self.job_toolbar if self.jobs.jobs else None,
+                    # Catch confirmations queued after the check above but before the prompt started
+                    pre_run=self.wake_for_confirmations
+                )
 
                 if not user_input:
                     continue
@@ -36,6 +68,83 @@ class CloudCLI:
                     self.ui.display_message(f"Model switched to '{new_model}' for provider '{self.agent.provider}'", "bold green")
                     continue
 
+                if user_input.startswith("--hedge "):
+                    self.configure_hedge(user_input.split("--hedge ", 1)[1].split())
+                    continue
+
+                if user_input.startswith("--timeout "):
+                    timeout = user_input.split("--timeout ", 1)[1].strip()
+                    try:
+                        timeout = float(timeout)
+                    except ValueError:
+                        self.ui.display_message(f"Invalid timeout: {timeout}", "red")
+                        continue
+                    if not self.MIN_TIMEOUT <= timeout < float("inf"):
+                        self.ui.display_message(f"Timeout must be at least {self.MIN_TIMEOUT}s", "red")
+                        continue
+                    self.agent.chat_dispatcher.timeout = timeout
+                    self.ui.display_message(f"Model timeout set to {timeout:g}s", "bold green")
+                    continue
+
+                if user_input == "--profile":
+                    if profiler.enabled:
+                        profiler.disable()
+                        self.ui.display_message("Profiling disabled.", "bold green")
+                    else:
+                        profiler.enable()
+                        self.ui.display_message(f"Profiling enabled. Reports are written to '{profiler.output_dir}'.", "bold green")
+                    continue
+
+                if user_input == "--stats":
+                    self.show_stats()
+                    continue
+
+                if user_input == "--vars":
+                    self.show_variables()
+                    continue
+
+                if user_input == "--reset":
+                    self.agent.function_caller.repl.reset()
+                    self.ui.display_message("REPL namespace cleared.", "bold green")
+                    continue
+
+                if user_input.startswith("&"):
+                    query = user_input[1:].strip()
+                    if not query:
+                        self.ui.display_message("Usage: & <question>", "yellow")
+                        continue
+                    job = self.jobs.submit(query)
+                    self.ui.display_message(f"Started background job #{job.id}. Use --jobs to follow it.", "bold green")
+                    continue
+
+                if user_input == "--jobs":
+                    self.show_jobs()
+                    continue
+
+                if user_input == "--job" or user_input.startswith("--job "):
+                    self.show_job(user_input[len("--job"):].strip())
+                    continue
+
+                if user_input == "--watch" or user_input.startswith("--watch "):
+                    interval = user_input[len("--watch"):].strip() or str(self.DEFAULT_WATCH_INTERVAL)
+                    try:
+                        interval = float(interval)
+                    except ValueError:
+                        self.ui.display_message(f"Invalid interval: {interval}", "red")
+                        continue
+                    if not self.MIN_WATCH_INTERVAL <= interval < float("inf"):
+                        self.ui.display_message(f"Interval must be at least {self.MIN_WATCH_INTERVAL}s", "red")
+                        continue
+                    self.watch(interval)
+                    continue
+
+                if user_input == "--interpret" or user_input.startswith("--interpret "):
+                    question = user_input[len("--interpret"):].strip()
+                    if not self.last_watch:
+                        self.ui.display_message("Nothing has been watched yet.", "yellow")
+                        continue
+                    user_input = self.interpretation_prompt(question)
+
                 # Normal prompt
                 result, style = self.agent.run(user_input)
 
@@ -44,9 +153,178 @@ class CloudCLI:
                 else:
                     self.ui.display_message(result, style)
 
+                if profiler.enabled:
+                    self.ui.display_message(f"Profile written to {profiler.last_report}", "grey50")
+
             except KeyboardInterrupt:
                 self.ui.display_message("Use 'exit' to quit.", "bold red")
             except EOFError:
                 break
             except Exception as e:
-                self.ui.display_message(f"Error: {str(e)}", "red")
\ No newline at end of file
+                self.ui.display_message(f"Error: {str(e)}", "red")
+
+    def configure_hedge(self, args):
+        if not args or args[0].lower() == "off":
+            self.agent.set_hedge(None)
+            self.ui.display_message("Hedging disabled.", "bold green")
+            return
+
+        hedge_provider = args[0].lower()
+        try:
+            hedge_after = float(args[1]) if len(args) > 1 else DEFAULT_HEDGE_AFTER
+            if not 0 <= hedge_after < float("inf"):
+                raise ValueError(f"hedge delay must be a number of seconds, got {args[1]}")
+            self.agent.set_hedge(hedge_provider, hedge_after)
+        except (ValueError, KeyError) as e:
+            self.ui.display_message(f"Could not enable hedging: {e}", "red")
+            return
+
+        self.ui.display_message(f"Requests slower than {hedge_after:g}s will also be sent to '{hedge_provider}'", "bold green")
+
+    def show_stats(self):
+        memory = self.agent.function_caller.repl.memory_stats()
+        chat = self.agent.chat_dispatcher.stats
+        aws = aws_rate_limiter.stats()
+        encoding = output_encoder.stats()
+        usage = self.agent.chat_dispatcher.usage_stats()
+        rows = [
+            ("Messages", len(self.agent.session.messages)),
+            ("Model requests", f"{chat['requests']} ({chat['retries']} retries, {chat['timeouts']} timeouts)"),
+            ("Hedged requests", f"{chat['hedges']} ({chat['hedge_wins']} won by hedge)"),
+            ("Prompt cache", self.format_cache(usage)),
+            ("Time to first token", self.format_first_token(usage)),
+            ("Tool output tokens", self.format_reduction(encoding["tokens_before"], encoding["tokens_after"])),
+            ("AWS API calls", f"{aws['calls']} ({aws['throttled']} throttled, {aws['waited']:.1f}s waiting for rate limit)"),
+            ("REPL variables", memory["variables"]),
+            ("REPL memory", f"{format_bytes(memory['used_bytes'])} / {format_bytes(memory['limit_bytes'])}"),
+            ("REPL evictions", f"{memory['evicted_count']} ({format_bytes(memory['evicted_bytes'])})"),
+        ]
+        self.ui.display_table("Session stats", ["Stat", "Value"], rows)
+
+        calls = encoding["per_call"]
+        if calls:
+            first = max(0, len(calls) - self.STATS_RECENT_CALLS)
+            rows = [(f"#{first + i + 1}", self.format_reduction(before, after)) for i, (before, after) in enumerate(calls[first:])]
+            title = "Tool output per call" + (f", last {len(rows)} of {len(calls)}" if first else "")
+            self.ui.display_table(title, ["Call", "Tokens"], rows)
+
+    @staticmethod
+    def format_reduction(before: int, after: int) -> str:
+        saved = 100 * (before - after) / before if before else 0
+        return f"~{before} -> ~{after} ({saved:.0f}% saved)"
+
+    def answer_job_confirmations(self):
+        """Ask, in the order they arrived, the confirmations background jobs are waiting on."""
+        while True:
+            request = self.jobs.next_confirmation()
+            if request is None:
+                return
+            try:
+                request.answer = self.ui.confirm_modification(
+                    request.resource_name, f"Background job #{request.job.id}: {request.job.query}"
+                )
+            except (KeyboardInterrupt, EOFError):
+                request.answer = "3"
+            request.answered.set()
+
+    def wake_for_confirmations(self):
+        if not self.jobs.confirmations.empty():
+            self.ui.interrupt_input()
+
+    def job_toolbar(self) -> str:
+        return f" Jobs: {self.jobs.summary()}"
+
+    def show_jobs(self):
+        rows = [
+            (f"#{job.id}", job.status, job.query[:60], f"{job.elapsed():.1f}s", job.tool_calls)
+            for job in self.jobs.jobs.values()
+        ]
+        self.ui.display_table("Background jobs", ["Job", "Status", "Question", "Elapsed", "Tool calls"], rows)
+
+    def show_job(self, job_id: str):
+        if not job_id and self.jobs.jobs:
+            job_id = str(max(self.jobs.jobs))
+        job = self.jobs.get(int(job_id)) if job_id.isdigit() else None
+        if job is None:
+            self.ui.display_message(f"No such job: {job_id or '-'}", "red")
+            return
+
+        self.ui.display_message(f"Job #{job.id} ({job.status}, {job.elapsed():.1f}s): {job.query}", "bold")
+        for message, color in job.messages:
+            self.ui.display_message(message, color)
+        if job.result is None:
+            self.ui.display_message("Still running.", "yellow")
+        elif job.style == "green":
+            self.ui.display_response(job.result)
+        else:
+            self.ui.display_message(job.result, job.style)
+
+    @staticmethod
+    def format_cache(usage: dict) -> str:
+        if not usage["requests"]:
+            return "-"
+        if not usage["cache_measured"]:
+            return f"cached tokens not reported, {usage['evaluated_tokens']} evaluated over {usage['requests']} requests"
+        cached = f"{usage['cached_tokens']} of {usage['prompt_tokens']} prompt tokens cached"
+        return f"{cached}, {usage['evaluated_tokens']} evaluated ({usage['cache_hits']}/{usage['cache_measured']} requests hit)"
+
+    @staticmethod
+    def format_first_token(usage: dict) -> str:
+        if usage["first_token"] is None:
+            return "-"
+        parts = [f"{usage['first_token']:.2f}s avg"]
+        if usage["first_token_hit"] is not None:
+            parts.append(f"{usage['first_token_hit']:.2f}s with cache hit")
+        if usage["first_token_miss"] is not None:
+            parts.append(f"{usage['first_token_miss']:.2f}s without")
+        return ", ".join(parts)
+
+    def show_variables(self):
+        rows = [
+            (name, format_bytes(size), f"{idle} snippet(s) ago" if idle else "last snippet")
+            for name, size, idle in self.agent.function_caller.repl.namespace_usage()
+        ]
+        self.ui.display_table("REPL variables", ["Name", "Size", "Last used"], rows)
+
+    def watch(self, interval: float):
+        """Re-run the last read-only command until interrupted, showing only what changed."""
+        last_call = self.agent.function_caller.last_read_only_call
+        if not last_call:
+            self.ui.display_message("No read-only command to watch yet. Ask a question first.", "yellow")
+            return
+
+        name, args = last_call
+        self.ui.display_code_block(args["command"])
+        self.ui.display_message(f"Watching every {interval:g}s. Press Ctrl+C to stop.", "bold green")
+
+        previous = None
+        try:
+            while True:
+                output = self.agent.function_caller.call(name, args)
+                timestamp = datetime.now().strftime("%H:%M:%S")
+
+                if previous is None:
+                    self.ui.display_message(f"[{timestamp}]", "bold")
+                    self.ui.display_code_block(output, "text")
+                elif output != previous:
+                    diff = difflib.unified_diff(
+                        previous.splitlines(), output.splitlines(), lineterm="", n=0
+                    )
+                    self.ui.display_message(f"[{timestamp}] changed:", "bold yellow")
+                    self.ui.display_diff("\n".join(list(diff)[2:]))
+                else:
+                    self.ui.display_message(f"[{timestamp}] no change", "grey50")
+
+                previous = output
+                self.last_watch = (args["command"], output)
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.ui.display_message("Stopped watching. Use --interpret to ask about the latest output.", "bold green")
+
+    def interpretation_prompt(self, question: str) -> str:
+        command, output = self.last_watch
+        return (
+            f"{question or 'Interpret the latest output of this watched command.'}\n\n"
+            f"Command:\n```python\n{command}\n```\n\n"
+            f"Latest output:\n```\n{output}\n```"
+        )
@@ -0,0 +1,31 @@
+import json
+import re
+import textwrap
+from typing import Any
+
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+def canonical_text(text: str) -> str:
+    """Dedent, drop trailing whitespace and collapse runs of blank lines."""
+    lines = [line.rstrip() for line in textwrap.dedent(text).splitlines()]
+    return BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+
+
+def canonical_tools(tools: list) -> list:
+    """Return tool schemas with tidy descriptions and sorted keys.
+
+    Providers cache the longest byte-identical request prefix, so the
+    schemas are built once at startup and the same object is sent every time.
+    """
+    def tidy(value: Any) -> Any:
+        if isinstance(value, dict):
+            return {
+                key: canonical_text(item) if key == "description" and isinstance(item, str) else tidy(item)
+                for key, item in value.items()
+            }
+        if isinstance(value, list):
+            return [tidy(item) for item in value]
+        return value
+
+    return json.loads(json.dumps(tidy(tools), sort_keys=True))
@@ -0,0 +1,238 @@
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Callable, List, Optional
+
+from .interfaces import ChatUsage, LLMProvider
+from tools.profiling import profiler
+
+DEFAULT_TIMEOUT = 120.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 1.0
+MAX_BACKOFF = 10.0
+DEFAULT_HEDGE_AFTER = 5.0
+# How often the idle deadline is re-read while a tool call holds the clock
+IDLE_POLL_INTERVAL = 1.0
+
+
+class ChatTarget:
+    def __init__(self, name: str, provider: LLMProvider, client: Any, model: str):
+        self.name = name
+        self.provider = provider
+        self.client = client
+        self.model = model
+
+
+class _FirstResponder:
+    """Lets only one of several racing requests dispatch tool calls.
+
+    Also tracks stream activity for the idle timeout: each chunk counts as
+    activity, and the clock is stopped while a tool call is being dispatched,
+    since that may wait on earlier tools or a confirmation prompt.
+    """
+
+    def __init__(self, on_tool_call: Callable):
+        self.on_tool_call = on_tool_call
+        self.lock = threading.Lock()
+        self.winner = None
+        self.closed = False
+        self.last_activity = time.monotonic()
+        self.busy = 0
+
+    def claim(self, target: ChatTarget) -> bool:
+        with self.lock:
+            if self.closed:
+                return False
+            if self.winner is None:
+                self.winner = target
+            return self.winner is target
+
+    def callback_for(self, target: ChatTarget) -> Callable:
+        def on_tool_call(*args):
+            if not self.claim(target):
+                return False
+            with self.lock:
+                self.busy += 1
+            try:
+                return self.on_tool_call(*args)
+            finally:
+                with self.lock:
+                    self.busy -= 1
+                    self.last_activity = time.monotonic()
+        return on_tool_call
+
+    def on_chunk(self) -> bool:
+        """Record stream activity; False tells an abandoned stream to stop."""
+        with self.lock:
+            self.last_activity = time.monotonic()
+            return not self.closed
+
+    def idle_deadline(self, timeout: float) -> float:
+        with self.lock:
+            return float("inf") if self.busy else self.last_activity + timeout
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+
+
+def _run_in_thread(func: Callable, *args) -> Future:
+    # Daemon threads, so a request stuck past its timeout cannot block exit
+    future = Future()
+
+    def runner():
+        try:
+            if profiler.enabled:
+                with profiler.thread():
+                    future.set_result(func(*args))
+            else:
+                future.set_result(func(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    # Carry the caller's context, so the profiler attributes the request to its turn
+    threading.Thread(target=contextvars.copy_context().run, args=(runner,), daemon=True).start()
+    return future
+
+
+class ChatDispatcher:
+    """Sends chat requests with a timeout, jittered retries and optional hedging.
+
+    When a hedge target is set and the primary has not answered within
+    `hedge_after` seconds (or has failed), the same request is sent to the
+    hedge target and whichever responds first is used.
+    """
+
+    def __init__(
+        self,
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        max_backoff: float = MAX_BACKOFF,
+    ):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge: Optional[ChatTarget] = None
+        self.hedge_after = DEFAULT_HEDGE_AFTER
+        self.stats = {"requests": 0, "retries": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0}
+        self.usage: List[ChatUsage] = []
+        self.usage_lock = threading.Lock()
+
+    def set_hedge(self, target: Optional[ChatTarget], hedge_after: float = DEFAULT_HEDGE_AFTER):
+        self.hedge = target
+        self.hedge_after = hedge_after
+
+    def chat(self, primary: ChatTarget, messages: list, tools: list, on_tool_call: Callable):
+        """Return the first successful (message, target) pair."""
+        self.stats["requests"] += 1
+        hedge = self.hedge if self.hedge and self.hedge.name != primary.name else None
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.stats["retries"] += 1
+                time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+
+            responder = _FirstResponder(on_tool_call)
+            try:
+                return self.race(primary, hedge, messages, tools, responder)
+            except Exception as e:
+                # Once tool calls have been dispatched, a retry would run them twice
+                if responder.winner is not None or not self.is_retryable(e) or attempt == self.retries:
+                    raise
+
+    def race(self, primary: ChatTarget, hedge: Optional[ChatTarget], messages: list, tools: list, responder: _FirstResponder):
+        started = time.monotonic()
+        hedge_at = started + self.hedge_after if hedge else None
+        pending = {self.submit(primary, messages, tools, responder): primary}
+        error = None
+
+        try:
+            while True:
+                now = time.monotonic()
+                # Once the primary is dispatching tool calls it has answered, so no hedge is needed
+                if hedge_at is not None and responder.winner is not None:
+                    hedge_at = None
+                if hedge_at is not None and (now >= hedge_at or not pending):
+                    self.stats["hedges"] += 1
+                    pending[self.submit(hedge, messages, tools, responder)] = hedge
+                    hedge_at = None
+                    continue
+
+                if not pending:
+                    raise error
+
+                # The timeout covers waiting for the first chunk and gaps between chunks,
+                # not the whole response or the tools it dispatches
+                deadline = responder.idle_deadline(self.timeout)
+                if now >= deadline:
+                    self.stats["timeouts"] += 1
+                    raise TimeoutError(f"No response from the model within {self.timeout:g}s")
+
+                next_event = min(deadline, now + IDLE_POLL_INTERVAL)
+                if hedge_at is not None:
+                    next_event = min(next_event, hedge_at)
+                done, _ = wait(pending, timeout=next_event - now, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    target = pending.pop(future)
+                    if future.exception() is not None:
+                        if responder.winner is target:
+                            raise future.exception()
+                        error = future.exception()
+                    elif responder.claim(target):
+                        if target is hedge:
+                            self.stats["hedge_wins"] += 1
+                        return future.result(), target
+        finally:
+            # Stop losing or abandoned requests from streaming on and dispatching tool calls
+            responder.close()
+
+    def submit(self, target: ChatTarget, messages: list, tools: list, responder: _FirstResponder) -> Future:
+        return _run_in_thread(
+            lambda: target.provider.chat_stream(
+                client=target.client,
+                model=target.model,
+                messages=target.provider.format_history(messages),
+                tools=tools,
+                on_tool_call=responder.callback_for(target),
+                on_usage=self.record_usage,
+                on_chunk=responder.on_chunk
+            )
+        )
+
+    def record_usage(self, usage: ChatUsage):
+        with self.usage_lock:
+            self.usage.append(usage)
+
+    def usage_stats(self) -> dict:
+        """Sum prompt-cache figures and compare time to first token with and without cache hits."""
+        with self.usage_lock:
+            usage = list(self.usage)
+
+        def mean(values):
+            return sum(values) / len(values) if values else None
+
+        # Ollama does not report cached tokens, so its requests are neither hits nor misses
+        hits = [u for u in usage if u.cached_tokens]
+        misses = [u for u in usage if u.cached_tokens == 0]
+        return {
+            "requests": len(usage),
+            "cache_measured": len(hits) + len(misses),
+            "prompt_tokens": sum(u.prompt_tokens or 0 for u in usage),
+            "cached_tokens": sum(u.cached_tokens or 0 for u in usage),
+            "evaluated_tokens": sum(u.evaluated_tokens or 0 for u in usage),
+            "cache_hits": len(hits),
+            "first_token": mean([u.first_token_seconds for u in usage if u.first_token_seconds is not None]),
+            "first_token_hit": mean([u.first_token_seconds for u in hits if u.first_token_seconds is not None]),
+            "first_token_miss": mean([u.first_token_seconds for u in misses if u.first_token_seconds is not None]),
+        }
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        # Client errors other than timeouts and rate limits will fail again
+        status = getattr(error, "status_code", None)
+        return not (isinstance(status, int) and 400 <= status < 500 and status not in (408, 409, 429))
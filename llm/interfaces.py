@@ -1,12 +1,35 @@
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, Callable, Optional
     
 class ToolCallResult:
     def __init__(self, result, tool_call_id=None, tool_name=None):
         self.result = result
         self.tool_call_id = tool_call_id
         self.tool_name = tool_name
-        
+
+
+class ChatUsage:
+    """Prompt-cache figures for one model request.
+
+    `cached_tokens` is what the provider reports as served from its prompt
+    cache; Ollama reports only the tokens it had to evaluate, so there
+    `cached_tokens` stays None and a cache hit shows as a small `evaluated_tokens`.
+    """
+
+    def __init__(
+        self,
+        prompt_tokens: Optional[int] = None,
+        cached_tokens: Optional[int] = None,
+        evaluated_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+        first_token_seconds: Optional[float] = None,
+    ):
+        self.prompt_tokens = prompt_tokens
+        self.cached_tokens = cached_tokens
+        self.evaluated_tokens = evaluated_tokens
+        self.completion_tokens = completion_tokens
+        self.first_token_seconds = first_token_seconds
+
 
 class LLMProvider(ABC):
     
@@ -14,7 +37,34 @@ class LLMProvider(ABC):
     def chat(self, client: Any, model: str, messages: list, tools: list):
         """Return a message from the model."""
         pass
+
+    def chat_stream(self, client: Any, model: str, messages: list, tools: list, on_tool_call: Callable, on_usage: Callable = None, on_chunk: Callable = None):
+        """Return a message from the model, passing each tool call to
+        `on_tool_call(tool_call_id, name, arguments)` as soon as it is complete.
+
+        Streaming stops early if `on_tool_call` or `on_chunk()`, called for
+        every chunk received, returns False. Providers that cannot stream fall
+        back to a regular chat call. Providers that report token usage pass a
+        ChatUsage to `on_usage` once the response is done.
+        """
+        message = self.chat(client=client, model=model, messages=messages, tools=tools)
+        for tool in getattr(message, "tool_calls", None) or []:
+            if on_tool_call(getattr(tool, "id", None), tool.function.name, tool.function.arguments) is False:
+                break
+        return message
     
+    def format_history(self, messages: list) -> list:
+        """Return the history in this provider's message shape.
+
+        With hedging, earlier turns may have been answered by a provider
+        with a different tool-call format.
+        """
+        return messages
+
+    def format_assistant_message(self, message: Any) -> dict:
+        """Return the message as a plain dict, so history serializes the same way on every request."""
+        return {"role": "assistant", "content": getattr(message, "content", None) or ""}
+
     @abstractmethod
     def format_tool_result(self, tool_result: ToolCallResult) -> dict:
-        pass
\ No newline at end of file
+        pass
@@ -1,19 +1,91 @@
-from tools.run_python_code import run_python_code
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import json
+from tools.run_python_code import run_python_code, python_repl
+from tools.code_classifier import command_verdict, modifies_resources
 from .interfaces import LLMProvider, ToolCallResult
 from ui.ui import UI
 
 class FunctionCaller:
-    def __init__(self):
+    def __init__(self, repl: python_repl = run_python_code):
+        self.repl = repl
         self.function_map = {
-            "run_python_code": run_python_code.run,
+            "run_python_code": repl.run,
         }
+        # Replayed by watch mode without going through the model
+        self.last_read_only_call = None
+        self.listeners = []
+
+    def add_listener(self, listener):
+        """Call `listener(name, args, result)` after every tool call."""
+        self.listeners.append(listener)
 
     def call(self, name, args):
         func = self.function_map.get(name)
         if func:
-            return func(**args)
+            result = func(**args)
+            if name == "run_python_code" and self.is_read_only(args) and self.repl.last_run_succeeded():
+                self.last_read_only_call = (name, dict(args))
+            for listener in self.listeners:
+                listener(name, args, result)
+            return result
         raise ValueError(f"Unknown tool function: {name}")
 
+    def is_read_only(self, args):
+        return not modifies_resources(args)
+
+class ToolDispatcher:
+    """Runs tool calls in the background while the model is still streaming."""
+
+    def __init__(self, function_caller: FunctionCaller, safety_controls: "SafetyControls"):
+        self.function_caller = function_caller
+        self.safety_controls = safety_controls
+        # A single worker keeps calls in order against the shared REPL namespace
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.pending = []
+        self.aborted = False
+
+    def submit(self, tool_call_id, name, args):
+        if self.aborted:
+            return False
+
+        if isinstance(args, str):
+            try:
+                args = json.loads(args)
+            except json.JSONDecodeError:
+                print(f"Invalid JSON in arguments: {args}")
+
+        # The confirmation prompt shares the terminal with running code,
+        # so let earlier calls finish before asking.
+        if self.safety_controls.needs_confirmation(args):
+            self.wait()
+
+        if not self.safety_controls.check(args):
+            self.aborted = True
+            return False
+
+        # Run in the caller's context, so profiled snippets land in the caller's turn
+        future = self.executor.submit(contextvars.copy_context().run, self.function_caller.call, name, args)
+        self.pending.append((tool_call_id, name, future))
+        return True
+
+    def wait(self):
+        for _, _, future in self.pending:
+            future.exception()
+
+    def results(self):
+        return [
+            ToolCallResult(
+                result=future.result(),
+                tool_call_id=tool_call_id,
+                tool_name=name
+            )
+            for tool_call_id, name, future in self.pending
+        ]
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
 class Session:
     def __init__(self, system_prompt: str, max_iterations: int, provider: LLMProvider):
         self.messages = [{"role": "system", "content": system_prompt}]
@@ -24,8 +96,13 @@ class Session:
     def add_message(self, role, content):
         self.messages.append({"role": role, "content": content})
 
-    def add_tool_response(self, tool_result: ToolCallResult):
-        formatted = self.provider.format_tool_result(tool_result)
+    def add_assistant_message(self, message, provider: LLMProvider = None):
+        # Plain dicts serialize identically on every request, keeping the prompt prefix cacheable
+        self.messages.append((provider or self.provider).format_assistant_message(message))
+
+    def add_tool_response(self, tool_result: ToolCallResult, provider: LLMProvider = None):
+        # Format for whichever provider produced the tool call
+        formatted = (provider or self.provider).format_tool_result(tool_result)
         self.messages.append(formatted)
         
 class SafetyControls:
@@ -33,8 +110,12 @@ class SafetyControls:
         self.ui = ui
         self.skip_permissions = False
 
+    def needs_confirmation(self, args):
+        return not self.skip_permissions and modifies_resources(args)
+
     def check(self, args):
-        if args.get("modifies_resource", "").lower() == "yes":
+        # The static verdict on the code overrides the model's modifies_resource claim
+        if modifies_resources(args):
             return self.confirm_resource_modification(args)
         return True  # If no special safety check is needed
 
@@ -42,7 +123,9 @@ class SafetyControls:
         if self.skip_permissions:
             return True
 
-        name = args.get("modified_resource_name", "This resource")
+        operations = command_verdict(args).mutating_operations
+        default_name = ", ".join(operations) if operations else "This resource"
+        name = args.get("modified_resource_name") or default_name
         
         confirmation = self.ui.confirm_modification(name)
 
@@ -52,4 +135,4 @@ class SafetyControls:
         elif confirmation == "2":
             self.skip_permissions = True
 
-        return True
\ No newline at end of file
+        return True
@@ -1,6 +1,8 @@
-from typing import Any
-from .interfaces import LLMProvider, ToolCallResult
-from ollama import Client
+import json
+import time
+from typing import Any, Callable
+from .interfaces import ChatUsage, LLMProvider, ToolCallResult
+from ollama import Client, Message
 
 class OllamaProvider(LLMProvider):
     def chat(self, client: Any,model: str, messages: list, tools: list):
@@ -11,7 +13,81 @@ class OllamaProvider(LLMProvider):
         )
         
         return response.message
+
+    def chat_stream(self, client: Any, model: str, messages: list, tools: list, on_tool_call: Callable, on_usage: Callable = None, on_chunk: Callable = None):
+        started = time.monotonic()
+        stream = client.chat(
+            model=model,
+            messages=messages,
+            tools=tools,
+            stream=True
+        )
+
+        usage = ChatUsage()
+        content = []
+        tool_calls = []
+
+        # Ollama emits each tool call whole, so it can be dispatched on arrival.
+        try:
+            for chunk in stream:
+                if on_chunk and on_chunk() is False:
+                    break
+                if usage.first_token_seconds is None and (chunk.message.content or chunk.message.tool_calls):
+                    usage.first_token_seconds = time.monotonic() - started
+                if chunk.done:
+                    # Ollama only evaluates the part of the prompt missing from its KV cache
+                    usage.evaluated_tokens = chunk.prompt_eval_count
+                    usage.completion_tokens = chunk.eval_count
+
+                if chunk.message.content:
+                    content.append(chunk.message.content)
+
+                for tool in chunk.message.tool_calls or []:
+                    tool_calls.append(tool)
+                    if on_tool_call(None, tool.function.name, tool.function.arguments) is False:
+                        return Message(role="assistant", content="".join(content), tool_calls=tool_calls)
+        finally:
+            stream.close()
+            if on_usage:
+                on_usage(usage)
+
+        return Message(role="assistant", content="".join(content), tool_calls=tool_calls or None)
     
+    def format_history(self, messages: list) -> list:
+        history = []
+        names = {}
+        for message in messages:
+            if message.get("role") == "assistant" and message.get("tool_calls"):
+                calls = []
+                for tool in message["tool_calls"]:
+                    name, arguments = tool["function"]["name"], tool["function"]["arguments"]
+                    if tool.get("id"):
+                        names[tool["id"]] = name
+                    if isinstance(arguments, str):
+                        try:
+                            arguments = json.loads(arguments)
+                        except json.JSONDecodeError:
+                            arguments = {}
+                    calls.append({"function": {"name": name, "arguments": arguments}})
+                message = {**message, "tool_calls": calls}
+            elif message.get("role") == "tool" and "tool_name" not in message:
+                message = {
+                    "role": "tool",
+                    "tool_name": names.get(message.get("tool_call_id"), ""),
+                    "content": message["content"],
+                }
+            history.append(message)
+        return history
+
+    def format_assistant_message(self, message) -> dict:
+        formatted = {"role": "assistant", "content": message.content or ""}
+        if message.tool_calls:
+            formatted["tool_calls"] = [
+                {"function": {"name": tool.function.name, "arguments": dict(tool.function.arguments)}}
+                for tool in message.tool_calls
+            ]
+        return formatted
+
     def format_tool_result(self, tool_result: ToolCallResult) -> dict:
         return {
             "role": "tool",
@@ -23,4 +99,4 @@ class OllamaProvider(LLMProvider):
         return Client(
         host='http://localhost:11434',
         headers={'x-some-header': 'some-value'}
-        )
\ No newline at end of file
+        )
@@ -1,6 +1,11 @@
-from .interfaces import LLMProvider, ToolCallResult
+from .interfaces import ChatUsage, LLMProvider, ToolCallResult
 import os
+import json
+import time
+from typing import Callable
 from openai import OpenAI, Client
+from openai.types.chat import ChatCompletionMessage, ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion_message_tool_call import Function
 
 class OpenAIProvider(LLMProvider):
     def chat(self, client: Client, model: str, messages: list, tools: list):
@@ -12,7 +17,144 @@ class OpenAIProvider(LLMProvider):
         )
         
         return completion.choices[0].message
+
+    def chat_stream(self, client: Client, model: str, messages: list, tools: list, on_tool_call: Callable, on_usage: Callable = None, on_chunk: Callable = None):
+        started = time.monotonic()
+        stream = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                tools=tools,
+                stream=True,
+                # The final chunk then carries token usage, including cached prompt tokens
+                stream_options={"include_usage": True},
+        )
+
+        usage = ChatUsage()
+        content = []
+        calls = {}
+        dispatched = set()
+
+        def dispatch(index):
+            dispatched.add(index)
+            call = calls[index]
+            return on_tool_call(call["id"], call["name"], call["arguments"]) is not False
+
+        try:
+            for chunk in stream:
+                if on_chunk and on_chunk() is False:
+                    break
+                if chunk.usage:
+                    self._record_usage(usage, chunk.usage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if usage.first_token_seconds is None and (delta.content or delta.tool_calls):
+                    usage.first_token_seconds = time.monotonic() - started
+
+                if delta.content:
+                    content.append(delta.content)
+
+                for tool_delta in delta.tool_calls or []:
+                    call = calls.setdefault(tool_delta.index, {"id": None, "name": "", "arguments": ""})
+                    if tool_delta.id:
+                        call["id"] = tool_delta.id
+                    if tool_delta.function:
+                        call["name"] += tool_delta.function.name or ""
+                        call["arguments"] += tool_delta.function.arguments or ""
+
+                # A call is complete once its arguments form a JSON object or
+                # the model has moved on to the next call.
+                for index in sorted(calls.keys() - dispatched):
+                    if not self._arguments_complete(calls[index]["arguments"]) and index == max(calls):
+                        continue
+                    if not dispatch(index):
+                        return self._build_message(content, calls, dispatched)
+
+            for index in sorted(calls.keys() - dispatched):
+                if not dispatch(index):
+                    break
+        finally:
+            stream.close()
+            if on_usage:
+                on_usage(usage)
+
+        return self._build_message(content, calls, dispatched)
+
+    @staticmethod
+    def _record_usage(usage: ChatUsage, reported):
+        details = getattr(reported, "prompt_tokens_details", None)
+        usage.prompt_tokens = reported.prompt_tokens
+        usage.completion_tokens = reported.completion_tokens
+        usage.cached_tokens = (getattr(details, "cached_tokens", None) or 0) if details is not None else None
+        if usage.cached_tokens is not None:
+            usage.evaluated_tokens = usage.prompt_tokens - usage.cached_tokens
+
+    @staticmethod
+    def _arguments_complete(arguments: str) -> bool:
+        if not arguments.rstrip().endswith("}"):
+            return False
+        try:
+            return isinstance(json.loads(arguments), dict)
+        except json.JSONDecodeError:
+            return False
+
+    @staticmethod
+    def _build_message(content: list, calls: dict, dispatched: set) -> ChatCompletionMessage:
+        tool_calls = [
+            ChatCompletionMessageToolCall(
+                id=calls[index]["id"],
+                type="function",
+                function=Function(name=calls[index]["name"], arguments=calls[index]["arguments"])
+            )
+            for index in sorted(dispatched)
+        ]
+        return ChatCompletionMessage(
+            role="assistant",
+            content="".join(content),
+            tool_calls=tool_calls or None
+        )
     
+    def format_history(self, messages: list) -> list:
+        history = []
+        call_ids = []
+        for message in messages:
+            if message.get("role") == "assistant" and message.get("tool_calls"):
+                calls = []
+                for tool in message["tool_calls"]:
+                    arguments = tool["function"]["arguments"]
+                    calls.append({
+                        # Ids derived from the position stay the same on every request
+                        "id": tool.get("id") or f"call_{len(history)}_{len(calls)}",
+                        "type": "function",
+                        "function": {
+                            "name": tool["function"]["name"],
+                            "arguments": arguments if isinstance(arguments, str) else json.dumps(arguments),
+                        },
+                    })
+                call_ids = [call["id"] for call in calls]
+                message = {**message, "tool_calls": calls}
+            elif message.get("role") == "tool":
+                # Tool results follow their assistant message in call order
+                call_id = message.get("tool_call_id") or (call_ids[0] if call_ids else "")
+                call_ids = call_ids[1:]
+                message = {"role": "tool", "content": message["content"], "tool_call_id": call_id}
+            history.append(message)
+        return history
+
+    def format_assistant_message(self, message) -> dict:
+        formatted = {"role": "assistant", "content": message.content or ""}
+        if message.tool_calls:
+            formatted["tool_calls"] = [
+                {
+                    "id": tool.id,
+                    "type": "function",
+                    # Arguments are kept exactly as the model wrote them
+                    "function": {"name": tool.function.name, "arguments": tool.function.arguments},
+                }
+                for tool in message.tool_calls
+            ]
+        return formatted
+
     def format_tool_result(self, tool_result: ToolCallResult) -> dict:
         return {
             "role": "tool",
@@ -30,4 +172,4 @@ class OpenAIProvider(LLMProvider):
         return OpenAI(
             base_url=os.environ.get("GROQ_API_BASE_URL", "https://api.groq.com/openai/v1"),
             api_key=os.environ["GROQ_API_KEY"]
-        )
\ No newline at end of file
+        )
@@ -6,6 +6,7 @@ from agent.agent import Agent
 from llm.llm import SafetyControls, Session, FunctionCaller
 from llm.ollama import OllamaProvider
 from llm.openai import OpenAIProvider
+from llm.canonical import canonical_text, canonical_tools
 
 def main():
     system_prompt = """
@@ -42,7 +43,7 @@ def main():
     default_model = "llama3.1"
     
     session = Session(
-        system_prompt=system_prompt,
+        system_prompt=canonical_text(system_prompt),
         max_iterations=MAX_ITERATIONS,
         provider=current_provider
     )
@@ -50,14 +51,22 @@ def main():
     function_caller = FunctionCaller()
     safety_controls = SafetyControls(ui)
 
+    # Offer resource IDs and variable names from tool output as completions
+    function_caller.add_listener(
+        lambda name, args, result: ui.completer.feed(
+            str(result), [variable for variable, _, _ in function_caller.repl.namespace_usage()]
+        )
+    )
+
     agent = Agent(
         client=client,
         session=session,
         model=default_model,
         function_caller=function_caller,
         safety_controls=safety_controls,
-        tools=tools,
+        tools=canonical_tools(tools),
         provider=current_provider,
+        provider_name="ollama",
     )
 
     app = CloudCLI(agent, ui)
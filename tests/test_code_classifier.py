@@ -0,0 +1,141 @@
+import pytest
+
+from llm.llm import FunctionCaller, SafetyControls
+from tools.code_classifier import MUTATING, READ_ONLY, UNKNOWN, CodeClassifier, modifies_resources
+
+
+class FakeUI:
+    def __init__(self, answer="3"):
+        self.answer = answer
+        self.confirmations = []
+
+    def confirm_modification(self, resource_name):
+        self.confirmations.append(resource_name)
+        return self.answer
+
+    def display_message(self, message, color="grey"):
+        pass
+
+
+def verdict(code):
+    return CodeClassifier.analyze(code).verdict
+
+
+@pytest.mark.parametrize("code", [
+    "sqs.purge_queue(QueueUrl=url)",
+    "ddb.batch_write_item(RequestItems=items)",
+    "s3.abort_multipart_upload(Bucket='b', Key='k', UploadId=upload)",
+    "ec2.request_spot_instances(InstanceCount=1)",
+    "kms.schedule_key_deletion(KeyId=key)",
+])
+def test_unrecognised_call_on_earlier_client_is_unknown(code):
+    assert verdict(code) == UNKNOWN
+
+
+@pytest.mark.parametrize("code", [
+    "import boto3\nec2 = boto3.client('ec2')\ngetattr(ec2, 'terminate_instances')(InstanceIds=['i-1'])",
+    "import boto3\nec2 = boto3.client('ec2')\nop = getattr(ec2, 'terminate_instances')\nop(InstanceIds=['i-1'])",
+    "import boto3\nec2 = boto3.client('ec2')\nop = ec2.terminate_instances\nop(InstanceIds=['i-1'])",
+    "import boto3\nboto3.client('ec2').stop_instances(InstanceIds=['i-1'])",
+])
+def test_mutating_client_operations(code):
+    assert verdict(code) == MUTATING
+
+
+@pytest.mark.parametrize("code", [
+    "import boto3\nec2 = boto3.client('ec2')\nprint(ec2.describe_instances())",
+    "import boto3\nec2 = boto3.client('ec2')\nprint(getattr(ec2, 'describe_instances')())",
+    "import boto3\ns3 = boto3.client('s3')\nfor page in s3.get_paginator('list_buckets').paginate():\n    print(page)",
+    "print(ec2.describe_instances()['Reservations'])",
+])
+def test_read_only_code(code):
+    assert verdict(code) == READ_ONLY
+
+
+def test_computed_getattr_is_unknown():
+    assert verdict("import boto3\nec2 = boto3.client('ec2')\ngetattr(ec2, name)()") == UNKNOWN
+
+
+def test_guessed_read_only_operation_is_unknown():
+    assert verdict("import boto3\nboto3.client(service).describe_things()") == UNKNOWN
+
+
+@pytest.mark.parametrize("command", [
+    "sqs.purge_queue(QueueUrl=url)",
+    "getattr(ec2, 'terminate_instances')(InstanceIds=ids)",
+    "print('cleanup')",
+])
+def test_model_yes_is_not_overruled_without_known_read_only_calls(command):
+    assert modifies_resources({"command": command, "modifies_resource": "yes"})
+
+
+@pytest.mark.parametrize("command", [
+    "import boto3\nprint(boto3.client('ec2').describe_instances())",
+    "import boto3\nec2 = boto3.client('ec2')\nprint(ec2.describe_instances())\ninstance.start()",
+    "import boto3\nprint(boto3.client('s3').list_buckets())\nobj.put(Body=data)",
+    "import boto3\nprint(boto3.client('cloudformation').describe_stacks())\nstack.update(TemplateBody=body)",
+])
+def test_model_yes_is_never_overruled(command):
+    assert modifies_resources({"command": command, "modifies_resource": "yes"})
+
+
+@pytest.mark.parametrize("answer", ["no", "unknown"])
+def test_known_read_only_calls_settle_model_no_or_unknown(answer):
+    command = "import boto3\nprint(boto3.client('ec2').describe_instances())"
+    assert not modifies_resources({"command": command, "modifies_resource": answer})
+
+
+@pytest.mark.parametrize("code", [
+    "instance.start()",
+    "obj.put(Body=data)",
+    "stack.update(TemplateBody=body)",
+    "queue.send(MessageBody='x')",
+])
+def test_mutating_verb_on_earlier_object_is_unknown(code):
+    assert verdict(code) == UNKNOWN
+
+
+@pytest.mark.parametrize("code", [
+    "seen = set()\nseen.add('a')",
+    "counts = {}\ncounts.update(a=1)",
+    "print('a-b'.replace('-', '_'))",
+    "names = [n for n in ['a']]\nnames.remove('a')",
+])
+def test_methods_on_plain_data_are_read_only(code):
+    assert verdict(code) == READ_ONLY
+
+
+@pytest.mark.parametrize("code", [
+    "from subprocess import run\nrun(['aws', 'ec2', 'terminate-instances'])",
+    "from os import system as sh\nsh('aws ec2 terminate-instances')",
+    "import subprocess as sp\nsp.check_call(['aws', 'ec2', 'terminate-instances'])",
+])
+def test_shell_access_is_unknown(code):
+    assert verdict(code) == UNKNOWN
+
+
+def test_single_word_client_method_taken_as_value():
+    code = "import boto3\nl = boto3.client('lambda')\nfn = l.invoke\nfn(FunctionName='f')"
+    assert verdict(code) == MUTATING
+
+
+def test_client_attributes_are_not_operations():
+    code = "import boto3\nec2 = boto3.client('ec2')\nprint(ec2.meta.region_name, ec2.exceptions.ClientError)"
+    assert verdict(code) == READ_ONLY
+
+
+def test_static_mutation_overrules_model_no():
+    command = "import boto3\nboto3.client('ec2').terminate_instances(InstanceIds=['i-1'])"
+    assert modifies_resources({"command": command, "modifies_resource": "no"})
+
+
+def test_safety_controls_ask_before_purging_queue():
+    ui = FakeUI(answer="3")
+    args = {"command": "sqs.purge_queue(QueueUrl=url)", "modifies_resource": "yes", "modified_resource_name": "jobs"}
+    assert SafetyControls(ui).check(args) is False
+    assert ui.confirmations == ["jobs"]
+
+
+def test_watch_does_not_treat_purge_as_read_only():
+    args = {"command": "sqs.purge_queue(QueueUrl=url)", "modifies_resource": "yes"}
+    assert not FunctionCaller().is_read_only(args)
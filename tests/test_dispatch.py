@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pytest
+
+from llm.dispatch import ChatDispatcher, ChatTarget
+from llm.interfaces import LLMProvider
+
+
+class FakeProvider(LLMProvider):
+    """Streams `chunks` chunks `delay` seconds apart, dispatching `tool_calls` after the first chunk."""
+
+    def __init__(self, delay=0.0, chunks=1, tool_calls=(), error=None, start_delay=0.0):
+        self.delay = delay
+        self.chunks = chunks
+        self.tool_calls = tool_calls
+        self.error = error
+        self.start_delay = start_delay
+        self.requests = 0
+        self.streamed = 0
+
+    def chat(self, client, model, messages, tools):
+        raise NotImplementedError
+
+    def chat_stream(self, client, model, messages, tools, on_tool_call, on_usage=None, on_chunk=None):
+        self.requests += 1
+        time.sleep(self.start_delay)
+        for number in range(self.chunks):
+            if number:
+                time.sleep(self.delay)
+            self.streamed += 1
+            if on_chunk and on_chunk() is False:
+                break
+            if number == 0:
+                for call_id in self.tool_calls:
+                    if on_tool_call(call_id, "run_python_code", "{}") is False:
+                        break
+        if self.error:
+            raise self.error
+        return {"role": "assistant", "content": model}
+
+    def format_tool_result(self, tool_result):
+        return {"role": "tool", "content": str(tool_result.result)}
+
+
+def target(name, provider):
+    return ChatTarget(name, provider, None, name)
+
+
+def dispatcher(**kwargs):
+    return ChatDispatcher(backoff=0, max_backoff=0, **kwargs)
+
+
+def test_only_one_hedged_request_dispatches_tools():
+    primary = FakeProvider(start_delay=0.3, tool_calls=["primary_call"])
+    hedge = FakeProvider(tool_calls=["hedge_call"])
+    chat = dispatcher()
+    chat.set_hedge(target("hedge", hedge), hedge_after=0.05)
+    dispatched = []
+
+    message, winner = chat.chat(target("primary", primary), [], [], lambda call_id, *args: dispatched.append(call_id))
+    time.sleep(0.4)
+
+    assert winner.name == "hedge"
+    assert dispatched == ["hedge_call"]
+    assert primary.requests == 1
+
+
+def test_losing_stream_is_stopped_once_a_winner_returns():
+    primary = FakeProvider(delay=0.05, chunks=100)
+    hedge = FakeProvider()
+    chat = dispatcher()
+    chat.set_hedge(target("hedge", hedge), hedge_after=0.1)
+
+    message, winner = chat.chat(target("primary", primary), [], [], lambda *args: None)
+    streamed = primary.streamed
+    time.sleep(0.3)
+
+    assert winner.name == "hedge"
+    assert primary.streamed - streamed <= 1
+
+
+def test_failed_request_is_retried():
+    provider = FakeProvider(error=RuntimeError("connection reset"))
+    chat = dispatcher(retries=2)
+    with pytest.raises(RuntimeError):
+        chat.chat(target("primary", provider), [], [], lambda *args: None)
+    assert provider.requests == 3
+
+
+def test_no_retry_after_tools_were_dispatched():
+    provider = FakeProvider(tool_calls=["call"], error=RuntimeError("connection reset"))
+    chat = dispatcher(retries=2)
+    dispatched = []
+    with pytest.raises(RuntimeError):
+        chat.chat(target("primary", provider), [], [], lambda call_id, *args: dispatched.append(call_id))
+    assert provider.requests == 1
+    assert dispatched == ["call"]
+
+
+def test_stalled_stream_times_out():
+    provider = FakeProvider(delay=1.0, chunks=2)
+    chat = dispatcher(timeout=0.2, retries=0)
+    with pytest.raises(TimeoutError):
+        chat.chat(target("primary", provider), [], [], lambda *args: None)
+
+
+def test_idle_timeout_is_paused_while_a_tool_call_waits_for_confirmation():
+    provider = FakeProvider(tool_calls=["call"])
+    chat = dispatcher(timeout=0.2, retries=0)
+    confirmed = threading.Event()
+
+    def confirm(*args):
+        # Stands in for a confirmation prompt that takes longer than the timeout
+        time.sleep(0.6)
+        confirmed.set()
+
+    message, winner = chat.chat(target("primary", provider), [], [], confirm)
+
+    assert confirmed.is_set()
+    assert message["content"] == "primary"
+    assert chat.stats["timeouts"] == 0
@@ -0,0 +1,35 @@
+import boto3
+from botocore.stub import Stubber
+
+from tools.frames import paginate_frame
+
+
+def stubbed(service, operation, *responses):
+    client = boto3.client(service, region_name="us-east-1", aws_access_key_id="key", aws_secret_access_key="secret")
+    stubber = Stubber(client)
+    for response in responses:
+        stubber.add_response(operation, response)
+    stubber.activate()
+    return client
+
+
+def test_describe_instances_gives_one_row_per_instance():
+    reservation = {"ReservationId": "r-1", "Instances": [{"InstanceId": "i-1"}, {"InstanceId": "i-2"}]}
+    ec2 = stubbed("ec2", "describe_instances", {"Reservations": [reservation]})
+    frame = paginate_frame(ec2, "describe_instances", columns=["InstanceId"])
+    assert frame["InstanceId"].tolist() == ["i-1", "i-2"]
+
+
+def test_result_path_overrides_result_key():
+    reservation = {"ReservationId": "r-1", "Instances": [{"InstanceId": "i-1"}]}
+    ec2 = stubbed("ec2", "describe_instances", {"Reservations": [reservation]})
+    frame = paginate_frame(ec2, "describe_instances", result_path="Reservations[]")
+    assert frame["ReservationId"].tolist() == ["r-1"]
+
+
+def test_several_result_keys_are_merged():
+    page = {"Contents": [{"Key": "a", "Size": 1}], "CommonPrefixes": [{"Prefix": "logs/"}], "IsTruncated": False}
+    s3 = stubbed("s3", "list_objects_v2", page)
+    frame = paginate_frame(s3, "list_objects_v2", Bucket="bucket")
+    assert frame["ResultKey"].tolist() == ["Contents", "CommonPrefixes"]
+    assert frame["Prefix"].tolist() == [None, "logs/"]
@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+
+from llm.openai import OpenAIProvider
+
+
+def tool_delta(index, arguments, call_id=None, name=None):
+    function = SimpleNamespace(name=name, arguments=arguments)
+    return SimpleNamespace(index=index, id=call_id, function=function)
+
+
+def chunk(content=None, tool_calls=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=delta)])
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.consumed = 0
+        self.closed = False
+
+    def __iter__(self):
+        for item in self.chunks:
+            self.consumed += 1
+            yield item
+
+    def close(self):
+        self.closed = True
+
+
+def fake_client(stream):
+    create = lambda **kwargs: stream
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def two_call_stream():
+    return FakeStream([
+        chunk(tool_calls=[tool_delta(0, '{"command": ', call_id="call_a", name="run_python_code")]),
+        chunk(tool_calls=[tool_delta(0, '"print(1)"}')]),
+        chunk(tool_calls=[tool_delta(1, '{"command": "pri', call_id="call_b", name="run_python_code")]),
+        chunk(tool_calls=[tool_delta(1, 'nt(2)"}')]),
+        chunk(content="done"),
+    ])
+
+
+def stream_chat(stream, on_tool_call, on_chunk=None):
+    return OpenAIProvider().chat_stream(
+        client=fake_client(stream), model="model", messages=[], tools=[],
+        on_tool_call=on_tool_call, on_chunk=on_chunk,
+    )
+
+
+def test_calls_are_dispatched_as_soon_as_their_arguments_are_complete():
+    stream = two_call_stream()
+    dispatched = []
+
+    def on_tool_call(call_id, name, arguments):
+        dispatched.append((call_id, arguments, stream.consumed))
+
+    message = stream_chat(stream, on_tool_call)
+
+    assert dispatched == [
+        ("call_a", '{"command": "print(1)"}', 2),
+        ("call_b", '{"command": "print(2)"}', 4),
+    ]
+    assert [call.id for call in message.tool_calls] == ["call_a", "call_b"]
+    assert message.content == "done"
+    assert stream.closed
+
+
+def test_incomplete_arguments_are_dispatched_when_the_next_call_starts():
+    stream = FakeStream([
+        chunk(tool_calls=[tool_delta(0, '{"command": "x"', call_id="call_a", name="run_python_code")]),
+        chunk(tool_calls=[tool_delta(1, '{"command": "y"}', call_id="call_b", name="run_python_code")]),
+    ])
+    dispatched = []
+    stream_chat(stream, lambda call_id, name, arguments: dispatched.append((call_id, stream.consumed)))
+    assert dispatched == [("call_a", 2), ("call_b", 2)]
+
+
+def test_false_from_on_tool_call_stops_the_stream():
+    stream = two_call_stream()
+    dispatched = []
+
+    def on_tool_call(call_id, name, arguments):
+        dispatched.append(call_id)
+        return False
+
+    message = stream_chat(stream, on_tool_call)
+
+    assert dispatched == ["call_a"]
+    assert stream.consumed == 2
+    assert stream.closed
+    assert [call.id for call in message.tool_calls] == ["call_a"]
+
+
+def test_false_from_on_chunk_stops_the_stream():
+    stream = two_call_stream()
+    dispatched = []
+    chunks = iter([True, True, False])
+
+    stream_chat(stream, lambda *args: dispatched.append(args[0]), on_chunk=lambda: next(chunks))
+
+    assert stream.consumed == 3
+    assert stream.closed
+    # The first call completed before the stream was abandoned
+    assert dispatched == ["call_a"]
@@ -0,0 +1,142 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+try:
+    import boto3
+    from botocore.config import Config
+except ImportError:
+    boto3 = None
+
+DEFAULT_RATE = 20.0
+MIN_RATE = 0.5
+MAX_RATE = 100.0
+RATE_INCREASE = 0.5
+THROTTLE_BACKOFF = 0.5
+MAX_ATTEMPTS = 10
+# Request context entry naming the bucket a request took its token from
+BUCKET_CONTEXT_KEY = "rate_limiter_bucket"
+
+THROTTLE_CODES = {
+    "Throttling", "ThrottlingException", "ThrottledException", "RequestThrottledException",
+    "TooManyRequestsException", "ProvisionedThroughputExceededException",
+    "TransactionInProgressException", "RequestLimitExceeded", "BandwidthLimitExceeded",
+    "LimitExceededException", "RequestThrottled", "SlowDown", "PriorRequestNotComplete",
+    "EC2ThrottledException",
+}
+
+
+class TokenBucket:
+    """Token bucket whose rate backs off on throttling and creeps up on success."""
+
+    def __init__(self, rate: float = DEFAULT_RATE):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.throttled = 0
+        self.waited = 0.0
+
+    def acquire(self) -> float:
+        """Take a token, sleeping until one is available. Returns the time waited."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Reserve the token even if it is not there yet, so waiters queue in order
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.calls += 1
+            self.waited += wait
+
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def on_throttle(self):
+        with self.lock:
+            self.throttled += 1
+            self.rate = max(MIN_RATE, self.rate * THROTTLE_BACKOFF)
+            self.tokens = min(self.tokens, 0.0)
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(MAX_RATE, self.rate + RATE_INCREASE)
+
+
+class AdaptiveRateLimiter:
+    """Shares one token bucket per (service, region) across every boto3 client in the process.
+
+    Hooks into botocore's event system so that each HTTP attempt takes a
+    token and throttling errors slow the bucket down.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE):
+        self.initial_rate = rate
+        self.buckets: Dict[Tuple[str, Optional[str]], TokenBucket] = {}
+        self.lock = threading.Lock()
+        self.installed = False
+
+    def bucket(self, service: str, region: Optional[str]) -> TokenBucket:
+        key = (service, region)
+        with self.lock:
+            if key not in self.buckets:
+                self.buckets[key] = TokenBucket(self.initial_rate)
+            return self.buckets[key]
+
+    def install(self):
+        """Register the limiter on boto3's default session, which `boto3.client()` uses."""
+        if self.installed or boto3 is None:
+            return
+
+        with self.lock:
+            if self.installed:
+                return
+            if boto3.DEFAULT_SESSION is None:
+                boto3.setup_default_session()
+            session = boto3.DEFAULT_SESSION._session
+
+            retries = Config(retries={"mode": "standard", "max_attempts": MAX_ATTEMPTS})
+            default_config = session.get_default_client_config()
+            session.set_default_client_config(default_config.merge(retries) if default_config else retries)
+
+            session.register("before-sign", self.before_sign)
+            session.register("needs-retry", self.needs_retry)
+            self.installed = True
+
+    def before_sign(self, event_name: str, region_name: Optional[str] = None, request=None, **kwargs):
+        key = (event_name.split(".")[1], region_name)
+        # Global services sign for a region other than the client's (IAM: us-east-1
+        # vs aws-global), so remember the bucket for needs_retry to slow down
+        if request is not None:
+            request.context[BUCKET_CONTEXT_KEY] = key
+        self.bucket(*key).acquire()
+
+    def needs_retry(self, event_name: str, response=None, request_dict=None, **kwargs):
+        context = (request_dict or {}).get("context", {})
+        key = context.get(BUCKET_CONTEXT_KEY) or (event_name.split(".")[1], context.get("client_region"))
+        bucket = self.bucket(*key)
+
+        if response is None:
+            return None
+
+        http_response, parsed = response
+        if parsed.get("Error", {}).get("Code") in THROTTLE_CODES or http_response.status_code == 429:
+            bucket.on_throttle()
+        elif http_response.status_code < 400:
+            bucket.on_success()
+        # Leave the retry decision to botocore
+        return None
+
+    def stats(self) -> Dict:
+        with self.lock:
+            buckets = list(self.buckets.values())
+        return {
+            "calls": sum(bucket.calls for bucket in buckets),
+            "throttled": sum(bucket.throttled for bucket in buckets),
+            "waited": sum(bucket.waited for bucket in buckets),
+        }
+
+
+aws_rate_limiter = AdaptiveRateLimiter()
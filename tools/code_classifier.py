@@ -0,0 +1,379 @@
+import ast
+import functools
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from tools.run_python_code import python_repl
+
+try:
+    import botocore.session
+    from botocore import xform_name
+except ImportError:
+    botocore = None
+
+READ_ONLY = "read_only"
+MUTATING = "mutating"
+UNKNOWN = "unknown"
+
+READ_ONLY_VERBS = {
+    "Describe", "Get", "List", "Head", "Search", "Lookup", "Scan", "Query",
+    "Select", "Filter", "Simulate", "Estimate", "Preview", "Validate",
+}
+READ_ONLY_OPERATIONS = {
+    "BatchGetItem", "BatchGetImage", "AssumeRole", "AssumeRoleWithSAML",
+    "AssumeRoleWithWebIdentity", "DecodeAuthorizationMessage",
+}
+
+# Methods boto3 adds to clients that are not API operations
+CLIENT_HELPERS = {
+    "get_paginator": READ_ONLY, "get_waiter": READ_ONLY, "can_paginate": READ_ONLY,
+    "generate_presigned_url": READ_ONLY, "generate_presigned_post": READ_ONLY,
+    "download_file": READ_ONLY, "download_fileobj": READ_ONLY, "close": READ_ONLY,
+    "upload_file": MUTATING, "upload_fileobj": MUTATING, "copy": MUTATING,
+}
+RESOURCE_READ_ONLY_METHODS = {
+    "all", "filter", "limit", "page_size", "pages", "load", "reload", "get",
+    "get_available_subresources",
+}
+# Verbs that mark a call on an unrecognised object (for example a client
+# created by an earlier snippet) as a possible resource change
+MUTATING_VERBS = {
+    "accept", "add", "allocate", "apply", "associate", "attach", "authorize",
+    "cancel", "change", "copy", "create", "delete", "deregister", "detach",
+    "disable", "disassociate", "enable", "execute", "export", "import", "invoke",
+    "modify", "publish", "purchase", "put", "reboot", "register", "reject",
+    "release", "remove", "replace", "reset", "restore", "revoke", "rotate", "run",
+    "send", "set", "start", "stop", "tag", "terminate", "untag", "update", "upload",
+}
+# Builtins whose results are plain data, so their methods never reach AWS
+PLAIN_CONSTRUCTORS = {
+    "list", "dict", "set", "frozenset", "tuple", "str", "bytearray", "sorted",
+    "defaultdict", "OrderedDict", "Counter", "deque",
+}
+PLAIN_LITERALS = (
+    ast.List, ast.Tuple, ast.Dict, ast.Set, ast.Constant, ast.JoinedStr,
+    ast.ListComp, ast.SetComp, ast.DictComp,
+)
+# Client attributes that are not API operations
+CLIENT_ATTRIBUTES = {"meta", "exceptions", "waiter_names"}
+# Multi-word methods of the standard library and the preloaded REPL helpers
+# that are safe to call on objects the snippet did not create
+SAFE_METHODS = {
+    "total_seconds", "most_common", "format_map",
+    "group_by", "to_records", "to_frame", "from_records", "fraction_above",
+}
+# Modules a snippet may use without importing them, because an earlier
+# snippet did or the REPL preloads them
+KNOWN_MODULES = {"boto3", "botocore", "np", "json", "datetime", "time", "math", "re", "collections", "itertools"}
+DYNAMIC_CALLS = {"exec", "eval", "compile", "__import__"}
+SHELL_MODULES = {"os", "subprocess"}
+
+CACHE_SIZE = 1024
+
+
+class CodeVerdict:
+    def __init__(self, verdict: str, operations: List[tuple], reason: Optional[str] = None):
+        self.verdict = verdict
+        self.operations = operations
+        self.reason = reason
+
+    @property
+    def read_only(self) -> bool:
+        return self.verdict == READ_ONLY
+
+    @property
+    def mutating_operations(self) -> List[str]:
+        return [operation for operation, verdict in self.operations if verdict == MUTATING]
+
+
+@functools.lru_cache(maxsize=None)
+def service_operations(service: str) -> Dict[str, str]:
+    """Map a client's snake_case method names to botocore operation names."""
+    if botocore is None:
+        return {}
+    try:
+        model = botocore.session.get_session().get_service_model(service)
+    except Exception:
+        return {}
+    return {xform_name(name): name for name in model.operation_names}
+
+
+def classify_operation(operation: str) -> str:
+    """Classify a botocore operation name such as "DescribeInstances"."""
+    if operation in READ_ONLY_OPERATIONS:
+        return READ_ONLY
+    verb = re.match(r"[A-Z][a-z]*", operation)
+    if verb and verb.group() in READ_ONLY_VERBS:
+        return READ_ONLY
+    return MUTATING
+
+
+def classify_method(method: str) -> str:
+    """Classify a snake_case method when the service model is not known."""
+    return classify_operation("".join(part.capitalize() for part in method.split("_")))
+
+
+class _Analyzer(ast.NodeVisitor):
+    def __init__(self):
+        # Variable name -> ("client" | "resource", service name or None)
+        self.receivers: Dict[str, tuple] = {}
+        self.operations: List[tuple] = []
+        self.unknown_reason: Optional[str] = None
+        self.modules = set(KNOWN_MODULES)
+        self.shell_modules = set(SHELL_MODULES)
+        # Functions imported from a shell module (from subprocess import run)
+        self.shell_functions = set()
+        # Variables holding plain data built by this snippet
+        self.plain_names = set()
+        # Attribute nodes already handled as the function of a call
+        self.called = set()
+
+    def visit_Import(self, node: ast.Import):
+        for alias in node.names:
+            name = (alias.asname or alias.name).split(".")[0]
+            self.modules.add(name)
+            if alias.name.split(".")[0] in SHELL_MODULES:
+                self.shell_modules.add(name)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        from_shell = (node.module or "").split(".")[0] in SHELL_MODULES
+        for alias in node.names:
+            name = alias.asname or alias.name
+            if from_shell:
+                self.shell_functions.add(name)
+            else:
+                self.modules.add(name)
+
+    def visit_Assign(self, node: ast.Assign):
+        self.generic_visit(node)
+        receiver = self.resolve(node.value)
+        plain = self.is_plain(node.value)
+        for target in node.targets:
+            if receiver:
+                self.bind(target, receiver)
+            if isinstance(target, ast.Name):
+                if plain:
+                    self.plain_names.add(target.id)
+                else:
+                    self.plain_names.discard(target.id)
+
+    def visit_For(self, node: ast.For):
+        receiver = self.resolve(node.iter)
+        if receiver and receiver[0] == "resource":
+            self.bind(node.target, receiver)
+        self.generic_visit(node)
+
+    def visit_comprehension(self, node: ast.comprehension):
+        receiver = self.resolve(node.iter)
+        if receiver and receiver[0] == "resource":
+            self.bind(node.target, receiver)
+        self.generic_visit(node)
+
+    def visit_ListComp(self, node):
+        # Bind generator targets before visiting the element expression
+        for generator in node.generators:
+            self.visit(generator)
+        self.visit(node.elt)
+
+    visit_SetComp = visit_GeneratorExp = visit_ListComp
+
+    def visit_DictComp(self, node: ast.DictComp):
+        for generator in node.generators:
+            self.visit(generator)
+        self.visit(node.key)
+        self.visit(node.value)
+
+    def visit_Call(self, node: ast.Call):
+        self.called.add(id(node.func))
+        self.generic_visit(node)
+        func = node.func
+
+        if isinstance(func, ast.Name) and func.id in DYNAMIC_CALLS:
+            self.unknown_reason = f"dynamic call to {func.id}()"
+            return
+
+        if isinstance(func, ast.Name) and func.id in self.shell_functions:
+            self.unknown_reason = f"shell access through {func.id}()"
+            return
+
+        if isinstance(func, ast.Name) and func.id == "getattr" and len(node.args) > 1:
+            name = node.args[1]
+            if not (isinstance(name, ast.Constant) and isinstance(name.value, str)):
+                self.unknown_reason = "attribute looked up by a computed name"
+                return
+            # getattr(client, "op") is checked exactly like client.op
+            func = ast.Attribute(value=node.args[0], attr=name.value, ctx=ast.Load())
+
+        if not isinstance(func, ast.Attribute):
+            return
+
+        if isinstance(func.value, ast.Name) and func.value.id in self.shell_modules:
+            self.unknown_reason = f"shell access through {func.value.id}.{func.attr}()"
+            return
+
+        self.check_method(func, node)
+
+    def visit_Attribute(self, node: ast.Attribute):
+        self.generic_visit(node)
+        if id(node) in self.called or not isinstance(node.ctx, ast.Load):
+            return
+        # A client method taken as a value (op = ec2.terminate_instances) can be called later
+        receiver = self.resolve(node.value)
+        if receiver and receiver[0] == "client" and node.attr not in CLIENT_ATTRIBUTES and not node.attr.startswith("_"):
+            self.record_client_call(receiver[1], node.attr, None)
+
+    def check_method(self, func: ast.Attribute, node: ast.Call):
+        method = func.attr
+        receiver = self.resolve(func.value)
+        if not receiver:
+            if self.root_name(func.value) in self.modules or self.is_plain(func.value):
+                return
+            if classify_method(method) == READ_ONLY or method.startswith("_"):
+                return
+            # Possibly a client or resource created by an earlier snippet
+            multi_word = "_" in method and method not in SAFE_METHODS
+            if multi_word or method.split("_")[0] in MUTATING_VERBS:
+                self.unknown_reason = f"{method}() called on an object this snippet did not create"
+            return
+
+        kind, service = receiver
+        if kind == "client":
+            self.record_client_call(service, method, node)
+        elif not method[:1].isupper() and not method.startswith("wait_until"):
+            verdict = READ_ONLY if method in RESOURCE_READ_ONLY_METHODS else classify_method(method)
+            self.operations.append((f"{service or 'resource'}.{method}", verdict))
+
+    def is_plain(self, node: ast.AST) -> bool:
+        """Whether an expression is plain data built by this snippet, such as a list or a string."""
+        if isinstance(node, ast.Name):
+            return node.id in self.plain_names
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            return node.func.id in PLAIN_CONSTRUCTORS
+        return isinstance(node, PLAIN_LITERALS)
+
+    @staticmethod
+    def root_name(node: ast.AST) -> Optional[str]:
+        while isinstance(node, (ast.Attribute, ast.Call, ast.Subscript)):
+            node = node.func if isinstance(node, ast.Call) else node.value
+        return node.id if isinstance(node, ast.Name) else None
+
+    def record_client_call(self, service: Optional[str], method: str, node: Optional[ast.Call]):
+        label = service or "client"
+
+        if method == "get_paginator":
+            if node and node.args and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str):
+                self.record_client_call(service, node.args[0].value, node)
+            else:
+                self.unknown_reason = "paginator for a computed operation"
+            return
+
+        if method in CLIENT_HELPERS:
+            self.operations.append((f"{label}.{method}", CLIENT_HELPERS[method]))
+            return
+
+        operations = service_operations(service) if service else {}
+        if method in operations:
+            self.operations.append((f"{label}.{operations[method]}", classify_operation(operations[method])))
+            return
+
+        # Without the service model the operation is only guessed from its name,
+        # which may flag a change but is never enough to rule one out
+        verdict = classify_method(method)
+        self.operations.append((f"{label}.{method}", verdict))
+        if verdict == READ_ONLY:
+            self.unknown_reason = f"{label}.{method}() is not a known operation"
+
+    def bind(self, target: ast.AST, receiver: tuple):
+        if isinstance(target, ast.Name):
+            self.receivers[target.id] = receiver
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for element in target.elts:
+                self.bind(element, receiver)
+
+    def resolve(self, node: ast.AST) -> Optional[tuple]:
+        """Return the (kind, service) of the boto3 client or resource an expression is rooted in."""
+        if isinstance(node, ast.Name):
+            return self.receivers.get(node.id)
+
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            if node.func.attr in ("client", "resource"):
+                return node.func.attr, self.service_name(node)
+            receiver = self.resolve(node.func.value)
+            # Calling a client returns plain data, calling a resource returns more resources
+            return receiver if receiver and receiver[0] == "resource" else None
+
+        if isinstance(node, (ast.Attribute, ast.Subscript)):
+            receiver = self.resolve(node.value)
+            return receiver if receiver and receiver[0] == "resource" else None
+
+        return None
+
+    @staticmethod
+    def service_name(node: ast.Call) -> Optional[str]:
+        candidates = list(node.args[:1]) + [kw.value for kw in node.keywords if kw.arg == "service_name"]
+        for candidate in candidates:
+            if isinstance(candidate, ast.Constant) and isinstance(candidate.value, str):
+                return candidate.value
+        return None
+
+
+class CodeClassifier:
+    """Statically classifies generated boto3 code as read-only or mutating."""
+
+    def __init__(self, cache_size: int = CACHE_SIZE):
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[str, CodeVerdict]" = OrderedDict()
+
+    def classify(self, code: str) -> CodeVerdict:
+        key = hashlib.sha256(code.encode("utf-8")).hexdigest()
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        verdict = self.analyze(code)
+        self.cache[key] = verdict
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return verdict
+
+    @staticmethod
+    def analyze(code: str) -> CodeVerdict:
+        try:
+            tree = ast.parse(code)
+        except SyntaxError as e:
+            return CodeVerdict(UNKNOWN, [], f"syntax error: {e.msg}")
+
+        analyzer = _Analyzer()
+        analyzer.visit(tree)
+
+        if any(verdict == MUTATING for _, verdict in analyzer.operations):
+            return CodeVerdict(MUTATING, analyzer.operations)
+        if analyzer.unknown_reason:
+            return CodeVerdict(UNKNOWN, analyzer.operations, analyzer.unknown_reason)
+        return CodeVerdict(READ_ONLY, analyzer.operations)
+
+
+code_classifier = CodeClassifier()
+
+
+def command_verdict(args: dict) -> CodeVerdict:
+    """Classify the code of a run_python_code call as the REPL will execute it."""
+    return code_classifier.classify(python_repl.sanitize_input(args.get("command", "")))
+
+
+def modifies_resources(args: dict) -> bool:
+    """Decide whether a run_python_code call may change AWS resources.
+
+    A static mutating verdict or a model "yes" always counts as a change. A
+    read-only verdict only settles a model "no" or "unknown", and only when the
+    code makes AWS calls; otherwise anything but "no" counts as a change.
+    """
+    verdict = command_verdict(args)
+    answer = args.get("modifies_resource", "").lower()
+    if verdict.verdict == MUTATING or answer == "yes":
+        return True
+    if verdict.verdict == READ_ONLY and verdict.operations:
+        return False
+    return answer != "no"
@@ -0,0 +1,347 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from tools.namespace_memory import format_bytes
+from tools.output_encoder import flatten
+
+AGGREGATIONS = ("count", "sum", "mean", "min", "max")
+MAX_REGION_WORKERS = 8
+SUMMARY_TOP_VALUES = 3
+
+# Operations whose paginator result key wraps the records one level too high
+RECORD_PATHS = {
+    ("ec2", "describe_instances"): "Reservations[].Instances[]",
+}
+
+
+def _tag_mapping(value):
+    # AWS tag lists become "Tags.<Key>" columns
+    if isinstance(value, list) and value and all(isinstance(item, dict) and set(item) == {"Key", "Value"} for item in value):
+        return {item["Key"]: item["Value"] for item in value}
+    return value
+
+
+def to_column(values: list) -> np.ndarray:
+    """Convert a list of Python values to the narrowest array that holds them."""
+    kinds = {type(value) for value in values if value is not None}
+    has_none = any(value is None for value in values)
+
+    try:
+        if kinds == {bool} and not has_none:
+            return np.array(values, dtype=bool)
+        if kinds == {int} and not has_none:
+            return np.array(values, dtype=np.int64)
+        if kinds and kinds <= {int, float}:
+            return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        if kinds == {datetime}:
+            return np.array([
+                np.datetime64("NaT") if value is None else
+                np.datetime64(value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value, "s")
+                for value in values
+            ], dtype="datetime64[s]")
+    except OverflowError:
+        pass
+
+    # fromiter keeps list values (e.g. security groups) as single cells
+    return np.fromiter(values, dtype=object, count=len(values))
+
+
+class _ColumnBuilder:
+    """Collects records page by page into per-column lists, keeping only wanted columns."""
+
+    def __init__(self, columns: Optional[Iterable[str]] = None):
+        self.wanted = set(columns) if columns else None
+        self.data: Dict[str, list] = {}
+        self.count = 0
+
+    def keep(self, key: str) -> bool:
+        return self.wanted is None or key in self.wanted or key.split(".", 1)[0] in self.wanted
+
+    def add(self, item: dict, extra: Optional[dict] = None):
+        record = flatten({key: _tag_mapping(value) for key, value in item.items()})
+        record = {key: value for key, value in record.items() if self.keep(key)}
+        record.update(extra or {})
+
+        for key, value in record.items():
+            column = self.data.get(key)
+            if column is None:
+                column = self.data[key] = [None] * self.count
+            column.append(value)
+
+        self.count += 1
+        for column in self.data.values():
+            if len(column) < self.count:
+                column.append(None)
+
+    def merge(self, other: "_ColumnBuilder"):
+        for key in other.data.keys() - self.data.keys():
+            self.data[key] = [None] * self.count
+        for key, column in self.data.items():
+            column.extend(other.data.get(key) or [None] * other.count)
+        self.count += other.count
+
+    def frame(self) -> "ResultFrame":
+        return ResultFrame({key: to_column(column) for key, column in self.data.items()})
+
+
+class ResultFrame:
+    """Columns of equal length, one NumPy array per field.
+
+    Filter with boolean masks (`frame.filter(frame["Size"] > 100)`), then
+    group, rank or summarize without looping over records in Python.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self.data = columns
+        lengths = {len(column) for column in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("All columns must have the same length")
+        self.length = lengths.pop() if lengths else 0
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict], columns: Optional[Iterable[str]] = None) -> "ResultFrame":
+        builder = _ColumnBuilder(columns)
+        for record in records:
+            builder.add(record)
+        return builder.frame()
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.data)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.data.values())
+
+    def __len__(self):
+        return self.length
+
+    def __contains__(self, name):
+        return name in self.data
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name not in self.data:
+            raise KeyError(f"No column {name!r}. Columns: {', '.join(self.columns)}")
+        return self.data[name]
+
+    def take(self, indices) -> "ResultFrame":
+        return ResultFrame({key: column[indices] for key, column in self.data.items()})
+
+    def select(self, *names: str) -> "ResultFrame":
+        return ResultFrame({name: self[name] for name in names})
+
+    def filter(self, mask=None, **equals) -> "ResultFrame":
+        """Keep rows where `mask` is True and each column equals the given value (or is in the given list)."""
+        keep = np.ones(self.length, dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+        for name, value in equals.items():
+            column = self[name]
+            if isinstance(value, (list, tuple, set)):
+                keep &= np.isin(column, list(value))
+            else:
+                keep &= column == value
+        return self.take(keep)
+
+    def head(self, n: int = 10) -> "ResultFrame":
+        return self.take(slice(0, n))
+
+    def sort(self, name: str, descending: bool = False) -> "ResultFrame":
+        order = np.argsort(self._sortable(self[name]), kind="stable")
+        return self.take(order[::-1] if descending else order)
+
+    def top(self, name: str, k: int = 10, smallest: bool = False) -> "ResultFrame":
+        """Return the k rows with the largest (or smallest) values in a numeric column."""
+        values = self._numeric(name)
+        valid = np.flatnonzero(~np.isnan(values))
+        k = min(k, len(valid))
+        if k == 0:
+            return self.take(valid)
+        keys = values[valid] if smallest else -values[valid]
+        chosen = np.argpartition(keys, k - 1)[:k]
+        chosen = chosen[np.argsort(keys[chosen], kind="stable")]
+        return self.take(valid[chosen])
+
+    def group_by(self, name: str, aggregations: Optional[Dict[str, str]] = None, **more: str) -> "ResultFrame":
+        """Count rows per value of `name` and aggregate other columns.
+
+        e.g. frame.group_by("VolumeType", Size="sum") -> columns VolumeType, count, Size_sum
+        """
+        aggregations = {**(aggregations or {}), **more}
+        keys, inverse = np.unique(self._sortable(self[name]), return_inverse=True)
+        inverse = inverse.ravel()
+        groups = len(keys)
+
+        result = {name: keys, "count": np.bincount(inverse, minlength=groups)}
+        for column, how in aggregations.items():
+            if how not in AGGREGATIONS:
+                raise ValueError(f"Unknown aggregation {how!r}, expected one of {', '.join(AGGREGATIONS)}")
+            result[f"{column}_{how}"] = self._aggregate(self._numeric(column), inverse, groups, how)
+
+        order = np.argsort(-result["count"], kind="stable")
+        return ResultFrame({key: column[order] for key, column in result.items()})
+
+    @staticmethod
+    def _aggregate(values: np.ndarray, inverse: np.ndarray, groups: int, how: str) -> np.ndarray:
+        valid = ~np.isnan(values)
+        counts = np.bincount(inverse[valid], minlength=groups)
+        if how == "count":
+            return counts
+        if how in ("min", "max"):
+            result = np.full(groups, np.nan)
+            (np.fmin if how == "min" else np.fmax).at(result, inverse, values)
+            return result
+        sums = np.bincount(inverse[valid], weights=values[valid], minlength=groups)
+        if how == "sum":
+            return sums
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return sums / counts
+
+    def _numeric(self, name: str) -> np.ndarray:
+        column = self[name]
+        if column.dtype.kind in "biuf":
+            return column.astype(np.float64)
+        if column.dtype.kind == "M":
+            values = column.astype(np.float64)
+            values[np.isnat(column)] = np.nan
+            return values
+        try:
+            return np.array([np.nan if value is None else value for value in column], dtype=np.float64)
+        except (TypeError, ValueError):
+            raise TypeError(f"Column {name!r} is not numeric")
+
+    @staticmethod
+    def _sortable(column: np.ndarray) -> np.ndarray:
+        if column.dtype != object:
+            return column
+        return np.array(["" if value is None else str(value) for value in column])
+
+    def to_records(self, limit: Optional[int] = None) -> List[dict]:
+        frame = self if limit is None else self.head(limit)
+        columns = {key: column.tolist() for key, column in frame.data.items()}
+        return [{key: values[i] for key, values in columns.items()} for i in range(len(frame))]
+
+    def summary(self) -> str:
+        lines = [f"ResultFrame: {self.length} rows x {len(self.data)} columns ({format_bytes(self.nbytes)})"]
+        for name, column in self.data.items():
+            lines.append(f"  {name}: {self._describe(column)}")
+        return "\n".join(lines)
+
+    def _describe(self, column: np.ndarray) -> str:
+        if column.dtype.kind in "iuf":
+            values = column[~np.isnan(column)] if column.dtype.kind == "f" else column
+            if not len(values):
+                return f"{column.dtype}, all empty"
+            return f"{column.dtype}, {len(values)} set, min {values.min():g}, mean {values.mean():g}, max {values.max():g}"
+        if column.dtype.kind == "M":
+            values = column[~np.isnat(column)]
+            if not len(values):
+                return "datetime, all empty"
+            return f"datetime, {len(values)} set, {values.min()} .. {values.max()}"
+        if column.dtype.kind == "b":
+            return f"bool, {int(column.sum())} true"
+
+        present = np.array([value is not None for value in column], dtype=bool)
+        values, counts = np.unique(self._sortable(column[present]), return_counts=True)
+        top = np.argsort(-counts, kind="stable")[:SUMMARY_TOP_VALUES]
+        common = ", ".join(f"{values[i][:40]!r} x{counts[i]}" for i in top)
+        return f"{int(present.sum())} set, {len(values)} distinct" + (f", e.g. {common}" if common else "")
+
+    def __repr__(self):
+        return self.summary()
+
+
+def paginate_frame(
+    client,
+    operation: str,
+    columns: Optional[Iterable[str]] = None,
+    regions: Optional[Iterable[str]] = None,
+    result_path: Optional[str] = None,
+    **params,
+) -> ResultFrame:
+    """Drain a boto3 paginator straight into a ResultFrame.
+
+    Pages are turned into columns as they arrive, so the full list of
+    response dicts is never held in memory. Pass `columns` to keep only the
+    fields you need, and `regions` to page the same operation in several
+    regions at once (adds a Region column).
+
+    Records are read from the paginator's result keys; when there are several
+    (Contents and CommonPrefixes for list_objects_v2) they are merged and a
+    ResultKey column tells them apart. `result_path` is a JMESPath expression
+    that overrides this, e.g. "Reservations[].Instances[]", which is already
+    the default for describe_instances.
+    """
+    service = client.meta.service_model.service_name
+    result_path = result_path or RECORD_PATHS.get((service, operation))
+
+    if not regions:
+        builder = _ColumnBuilder(columns)
+        _drain(client, operation, params, builder, result_path)
+        return builder.frame()
+
+    # Clients are created up front on this thread, because creating them is not thread-safe
+    clients = _regional_clients(client, list(regions))
+
+    def page_region(region):
+        builder = _ColumnBuilder(columns)
+        _drain(clients[region], operation, params, builder, result_path, {"Region": region})
+        return builder
+
+    with ThreadPoolExecutor(max_workers=min(MAX_REGION_WORKERS, len(clients))) as executor:
+        builders = list(executor.map(page_region, clients))
+
+    merged = _ColumnBuilder(columns)
+    for builder in builders:
+        merged.merge(builder)
+    return merged.frame()
+
+
+def _regional_clients(client, regions: List[str]) -> dict:
+    """Create a client per region with the same credentials and config as `client`."""
+    import boto3
+
+    # boto3 keeps no link from a client to its session, so reuse the client's credentials
+    credentials = getattr(getattr(client, "_request_signer", None), "_credentials", None)
+    keys = {}
+    if credentials is not None:
+        frozen = credentials.get_frozen_credentials()
+        keys = {
+            "aws_access_key_id": frozen.access_key,
+            "aws_secret_access_key": frozen.secret_key,
+            "aws_session_token": frozen.token,
+        }
+    service = client.meta.service_model.service_name
+    return {
+        region: boto3.client(service, region_name=region, config=client.meta.config, **keys)
+        for region in regions
+    }
+
+
+def _drain(
+    client,
+    operation: str,
+    params: dict,
+    builder: _ColumnBuilder,
+    result_path: Optional[str] = None,
+    extra: Optional[dict] = None,
+):
+    pages = client.get_paginator(operation).paginate(**params)
+    if result_path:
+        import jmespath
+
+        expressions = [(None, jmespath.compile(result_path))]
+    else:
+        keys = pages.result_keys
+        expressions = [(key.expression if len(keys) > 1 else None, key) for key in keys]
+
+    for page in pages:
+        for label, expression in expressions:
+            items = expression.search(page)
+            # Some result keys are counters, e.g. Count in a DynamoDB scan
+            if not isinstance(items, list):
+                continue
+            tags = {**(extra or {}), "ResultKey": label} if label else extra
+            for item in items:
+                builder.add(item if isinstance(item, dict) else {"Value": item}, tags)
@@ -0,0 +1,190 @@
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from tools.frames import ResultFrame
+
+# GetMetricData accepts at most this many queries per request
+MAX_QUERIES_PER_REQUEST = 500
+MAX_BATCH_WORKERS = 8
+DEFAULT_PERIOD = 300
+DEFAULT_WINDOW = timedelta(days=1)
+
+
+class MetricMatrix:
+    """One metric for many resources, as a (resources x timestamps) array with NaN gaps.
+
+    Reductions return one value per resource, in `resource_ids` order.
+    """
+
+    def __init__(self, metric: str, stat: str, period: int, resource_ids: np.ndarray, timestamps: np.ndarray, values: np.ndarray):
+        self.metric = metric
+        self.stat = stat
+        self.period = period
+        self.resource_ids = resource_ids
+        self.timestamps = timestamps
+        self.values = values
+
+    def _reduce(self, func, *args) -> np.ndarray:
+        # Resources without datapoints reduce to NaN instead of warning
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            return func(self.values, *args, axis=1)
+
+    def mean(self) -> np.ndarray:
+        return self._reduce(np.nanmean)
+
+    def min(self) -> np.ndarray:
+        return self._reduce(np.nanmin)
+
+    def max(self) -> np.ndarray:
+        return self._reduce(np.nanmax)
+
+    def sum(self) -> np.ndarray:
+        return self._reduce(np.nansum)
+
+    def percentile(self, q: float) -> np.ndarray:
+        return self._reduce(np.nanpercentile, q)
+
+    def datapoints(self) -> np.ndarray:
+        return np.count_nonzero(~np.isnan(self.values), axis=1)
+
+    def fraction_above(self, threshold: float) -> np.ndarray:
+        """Share of each resource's datapoints above `threshold`."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.count_nonzero(self.values > threshold, axis=1) / self.datapoints()
+
+    def aggregate(self, how: str) -> np.ndarray:
+        """"mean", "min", "max", "sum" or a percentile such as "p95"."""
+        if how.startswith("p") and how[1:].replace(".", "", 1).isdigit():
+            return self.percentile(float(how[1:]))
+        if how not in ("mean", "min", "max", "sum"):
+            raise ValueError(f"Unknown aggregation {how!r}, expected mean, min, max, sum or pNN")
+        return getattr(self, how)()
+
+    def below(self, threshold: float, how: str = "mean") -> np.ndarray:
+        """IDs of resources whose aggregate is under `threshold` (resources without data are left out)."""
+        return self.resource_ids[self.aggregate(how) < threshold]
+
+    def above(self, threshold: float, how: str = "mean") -> np.ndarray:
+        return self.resource_ids[self.aggregate(how) > threshold]
+
+    def missing(self) -> np.ndarray:
+        return self.resource_ids[self.datapoints() == 0]
+
+    def to_frame(self, *aggregations: str) -> ResultFrame:
+        """One row per resource, e.g. to_frame("mean", "p95", "max")."""
+        columns = {"ResourceId": self.resource_ids, "datapoints": self.datapoints()}
+        for how in aggregations or ("mean", "max"):
+            columns[how] = self.aggregate(how)
+        return ResultFrame(columns)
+
+    def summary(self) -> str:
+        resources, periods = self.values.shape
+        filled = np.count_nonzero(~np.isnan(self.values)) / self.values.size if self.values.size else 0
+        lines = [
+            f"MetricMatrix {self.metric} ({self.stat}, {self.period}s): "
+            f"{resources} resources x {periods} periods, {filled:.1%} filled"
+        ]
+        if periods:
+            lines.append(f"  {self.timestamps[0]} .. {self.timestamps[-1]} UTC")
+        means = self.mean()
+        if np.any(~np.isnan(means)):
+            lines.append(
+                f"  per-resource mean: min {np.nanmin(means):g}, median {np.nanmedian(means):g}, max {np.nanmax(means):g}"
+            )
+        if len(self.missing()):
+            lines.append(f"  {len(self.missing())} resources without datapoints")
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return self.summary()
+
+
+def _utc(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def fetch_metrics(
+    cloudwatch,
+    namespace: str,
+    metric: Union[str, List[str]],
+    dimension: str,
+    resource_ids: Iterable[str],
+    start: Union[datetime, timedelta] = DEFAULT_WINDOW,
+    end: Optional[datetime] = None,
+    period: int = DEFAULT_PERIOD,
+    stat: str = "Average",
+    dimensions: Optional[Dict[str, str]] = None,
+) -> Union[MetricMatrix, Dict[str, MetricMatrix]]:
+    """Fetch a metric for many resources with as few GetMetricData calls as possible.
+
+    Queries are packed 500 to a request and the requests are paged
+    concurrently. `start` may be a datetime or a timedelta before `end`
+    (default: now). `dimensions` are added to every query, e.g.
+    {"StorageType": "StandardStorage"}. A list of metrics returns a dict of
+    matrices keyed by metric name.
+    """
+    end = _utc(end or datetime.now(timezone.utc))
+    start = end - start if isinstance(start, timedelta) else _utc(start)
+    # CloudWatch aligns datapoints to multiples of the period
+    first = int(start.timestamp()) // period * period
+    periods = max(0, -(-(int(end.timestamp()) - first) // period))
+
+    metrics = [metric] if isinstance(metric, str) else list(metric)
+    ids = np.array([str(resource_id) for resource_id in resource_ids], dtype=object)
+    queries = [
+        {
+            "Id": f"m{index}",
+            "MetricStat": {
+                "Metric": {
+                    "Namespace": namespace,
+                    "MetricName": name,
+                    "Dimensions": [{"Name": dimension, "Value": resource_id}]
+                        + [{"Name": key, "Value": value} for key, value in (dimensions or {}).items()],
+                },
+                "Period": period,
+                "Stat": stat,
+            },
+            "ReturnData": True,
+        }
+        for index, (name, resource_id) in enumerate((name, resource_id) for name in metrics for resource_id in ids)
+    ]
+
+    values = np.full((len(queries), periods), np.nan)
+
+    def run_batch(batch: list):
+        pages = cloudwatch.get_paginator("get_metric_data").paginate(
+            MetricDataQueries=batch,
+            StartTime=datetime.fromtimestamp(first, timezone.utc),
+            EndTime=end,
+            ScanBy="TimestampAscending",
+        )
+        for page in pages:
+            for result in page["MetricDataResults"]:
+                if not result["Timestamps"]:
+                    continue
+                row = int(result["Id"][1:])
+                # botocore returns timezone-aware timestamps
+                seconds = np.fromiter(
+                    (timestamp.timestamp() for timestamp in result["Timestamps"]), dtype=np.float64, count=len(result["Timestamps"])
+                ).astype(np.int64)
+                columns = (seconds - first) // period
+                inside = (columns >= 0) & (columns < periods)
+                # Each batch writes its own rows, so threads never overlap
+                values[row, columns[inside]] = np.asarray(result["Values"], dtype=np.float64)[inside]
+
+    batches = [queries[i:i + MAX_QUERIES_PER_REQUEST] for i in range(0, len(queries), MAX_QUERIES_PER_REQUEST)]
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(MAX_BATCH_WORKERS, len(batches))) as executor:
+            list(executor.map(run_batch, batches))
+
+    timestamps = np.datetime64(first, "s") + np.arange(periods) * np.timedelta64(period, "s")
+    matrices = {
+        name: MetricMatrix(name, stat, period, ids, timestamps, values[i * len(ids):(i + 1) * len(ids)])
+        for i, name in enumerate(metrics)
+    }
+    return matrices[metric] if isinstance(metric, str) else matrices
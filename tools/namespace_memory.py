@@ -0,0 +1,163 @@
+import ast
+import os
+import sys
+import types
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_LIMIT_MB = 512
+MIN_EVICT_BYTES = 1024 * 1024
+
+# Large sequences are estimated from a sample instead of walked item by item
+SAMPLE_THRESHOLD = 1000
+SAMPLE_SIZE = 100
+
+UNTRACKED_TYPES = (
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+    type,
+)
+
+
+def estimate_size(obj, seen: Optional[set] = None, follow_objects: bool = True) -> int:
+    """Estimate the memory held by `obj`, including the objects it contains.
+
+    Containers are walked fully, but only one level of object attributes is
+    followed so that clients and sessions are not charged for shared caches.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or isinstance(obj, UNTRACKED_TYPES):
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj, 0)
+
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+        return size
+
+    if isinstance(obj, dict):
+        size += _estimate_items(list(obj.keys()), seen, follow_objects)
+        size += _estimate_items(list(obj.values()), seen, follow_objects)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += _estimate_items(list(obj), seen, follow_objects)
+    elif follow_objects and hasattr(obj, "__dict__"):
+        size += estimate_size(vars(obj), seen, follow_objects=False)
+
+    return size
+
+
+def _estimate_items(items: list, seen: set, follow_objects: bool) -> int:
+    if len(items) <= SAMPLE_THRESHOLD:
+        return sum(estimate_size(item, seen, follow_objects) for item in items)
+
+    step = len(items) // SAMPLE_SIZE
+    sample = items[::step][:SAMPLE_SIZE]
+    return sum(estimate_size(item, seen, follow_objects) for item in sample) * len(items) // len(sample)
+
+
+def format_bytes(size: int) -> str:
+    for unit in ["B", "KB", "MB"]:
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class NamespaceMemory:
+    """Tracks estimated sizes of REPL bindings and evicts large, least recently used ones over a cap."""
+
+    def __init__(self, limit_bytes: Optional[int] = None, min_evict_bytes: int = MIN_EVICT_BYTES):
+        if limit_bytes is None:
+            limit_mb = float(os.environ.get("REPL_MEMORY_LIMIT_MB", DEFAULT_LIMIT_MB))
+            limit_bytes = int(limit_mb * 1024 * 1024)
+
+        self.limit_bytes = limit_bytes
+        self.min_evict_bytes = min_evict_bytes
+        self.sizes: Dict[str, int] = {}
+        self.last_used: Dict[str, int] = {}
+        self.clock = 0
+        self.evicted_count = 0
+        self.evicted_bytes = 0
+
+    @staticmethod
+    def referenced_names(command: str) -> set:
+        try:
+            tree = ast.parse(command)
+        except SyntaxError:
+            return set()
+        return {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+
+    @staticmethod
+    def bindings(namespaces: Iterable[dict]) -> dict:
+        current = {}
+        for namespace in namespaces:
+            for name, value in namespace.items():
+                if not name.startswith("__") and not isinstance(value, UNTRACKED_TYPES):
+                    current[name] = value
+        return current
+
+    def update(self, namespaces: List[dict], used_names: set) -> List[str]:
+        """Re-measure bindings touched by the last snippet and evict if over the cap.
+
+        Returns the names of the evicted bindings.
+        """
+        self.clock += 1
+        current = self.bindings(namespaces)
+
+        for name in list(self.sizes):
+            if name not in current:
+                self.forget(name)
+
+        for name, value in current.items():
+            if name in used_names or name not in self.sizes:
+                self.sizes[name] = estimate_size(value)
+                self.last_used[name] = self.clock
+
+        return self.evict(namespaces, protected=used_names)
+
+    def evict(self, namespaces: List[dict], protected: Iterable[str] = ()) -> List[str]:
+        total = self.total()
+        if total <= self.limit_bytes:
+            return []
+
+        candidates = sorted(
+            (name for name, size in self.sizes.items()
+             if size >= self.min_evict_bytes and name not in protected),
+            key=lambda name: self.last_used[name]
+        )
+
+        evicted = []
+        for name in candidates:
+            if total <= self.limit_bytes:
+                break
+            for namespace in namespaces:
+                namespace.pop(name, None)
+            size = self.sizes[name]
+            self.forget(name)
+            total -= size
+            self.evicted_count += 1
+            self.evicted_bytes += size
+            evicted.append(name)
+
+        return evicted
+
+    def forget(self, name: str):
+        self.sizes.pop(name, None)
+        self.last_used.pop(name, None)
+
+    def total(self) -> int:
+        return sum(self.sizes.values())
+
+    def usage(self) -> List[Tuple[str, int, int]]:
+        """Return (name, estimated bytes, snippets since last use), largest first."""
+        return sorted(
+            ((name, size, self.clock - self.last_used[name]) for name, size in self.sizes.items()),
+            key=lambda row: row[1],
+            reverse=True
+        )
+
+    def reset(self):
+        self.sizes.clear()
+        self.last_used.clear()
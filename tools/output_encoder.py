@@ -0,0 +1,157 @@
+import ast
+import json
+import re
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, List, Tuple
+
+# Keys boto3 adds to every response that never help answer a question
+BOILERPLATE_KEYS = {"ResponseMetadata"}
+
+DATETIME_RE = re.compile(
+    r"datetime\.datetime\(([\d,\s]+?)"
+    r"(?:,\s*tzinfo=(tzutc\(\)|tzlocal\(\)|tzoffset\([^,()]*,\s*(-?\d+)\)|datetime\.timezone\.utc))?\)"
+)
+DATE_RE = re.compile(r"datetime\.date\(([\d,\s]+?)\)")
+DECIMAL_RE = re.compile(r"Decimal\('(-?[\d.Ee+-]+)'\)")
+
+MIN_TABLE_ROWS = 2
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def normalize_timestamps(text: str) -> str:
+    """Replace datetime/Decimal reprs with plain literals, e.g. '2024-05-01T10:00:00Z'.
+
+    Timestamps with a known zone are converted to UTC; naive ones are left as they are.
+    """
+    def replace_datetime(match):
+        parts = [int(part) for part in match.group(1).split(",") if part.strip()]
+        value = datetime(*parts[:6])
+        zone, offset = match.group(2), match.group(3)
+        if zone is None:
+            return repr(value.isoformat())
+        # Aware timestamps are converted to UTC, so they all compare at a glance
+        if zone == "tzlocal()":
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        elif offset is not None:
+            value -= timedelta(seconds=int(offset))
+        return repr(value.isoformat() + "Z")
+
+    def replace_date(match):
+        return repr(date(*[int(part) for part in match.group(1).split(",") if part.strip()]).isoformat())
+
+    text = DATETIME_RE.sub(replace_datetime, text)
+    text = DATE_RE.sub(replace_date, text)
+    return DECIMAL_RE.sub(r"\1", text)
+
+
+def parse_literal(text: str) -> Any:
+    """Parse printed JSON or a Python literal; raise ValueError if it is neither."""
+    text = text.strip()
+    if not text or text[0] not in "[{(":
+        raise ValueError("not a literal")
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return ast.literal_eval(text)
+    except (SyntaxError, ValueError, MemoryError, RecursionError):
+        raise ValueError("not a literal")
+
+
+def flatten(record: dict) -> dict:
+    """Lift nested dicts into dotted keys, e.g. {"State": {"Name": ..}} -> {"State.Name": ..}."""
+    flat = {}
+    for key, item in record.items():
+        if isinstance(item, dict) and item and "columns" not in item:
+            for inner_key, inner_item in flatten(item).items():
+                flat[f"{key}.{inner_key}"] = inner_item
+        else:
+            flat[key] = item
+    return flat
+
+
+def compact(value: Any) -> Any:
+    """Strip boilerplate and turn lists of similar records into column/row tables."""
+    if isinstance(value, dict):
+        return {
+            str(key): compact(item)
+            for key, item in value.items()
+            if key not in BOILERPLATE_KEYS
+        }
+
+    if isinstance(value, (list, tuple, set)):
+        # AWS tag lists read better as a plain mapping
+        if value and all(isinstance(item, dict) and set(item) == {"Key", "Value"} for item in value):
+            return {item["Key"]: item["Value"] for item in value}
+
+        items = [compact(item) for item in value]
+        if len(items) >= MIN_TABLE_ROWS and all(isinstance(item, dict) for item in items):
+            items = [flatten(item) for item in items]
+            columns = list(dict.fromkeys(key for item in items for key in item))
+            return {
+                "columns": columns,
+                "rows": [[item.get(column) for column in columns] for item in items],
+            }
+        return items
+
+    return value
+
+
+class OutputEncoder:
+    """Re-encodes printed tool output compactly before it is sent to the model."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls: List[Tuple[int, int]] = []
+
+    def encode(self, output: str) -> str:
+        normalized = normalize_timestamps(output)
+        encoded = self.encode_text(normalized)
+
+        # Never hand the model something longer than what was printed
+        if len(encoded) > len(output):
+            encoded = output
+
+        with self.lock:
+            self.calls.append((estimate_tokens(output), estimate_tokens(encoded)))
+        return encoded
+
+    def encode_text(self, text: str) -> str:
+        try:
+            return self.dump(parse_literal(text))
+        except ValueError:
+            pass
+
+        # Mixed output: encode each line that is a literal on its own
+        lines = []
+        for line in text.splitlines():
+            try:
+                lines.append(self.dump(parse_literal(line)))
+            except ValueError:
+                lines.append(line)
+        return "\n".join(lines) + ("\n" if text.endswith("\n") else "")
+
+    @staticmethod
+    def dump(value: Any) -> str:
+        return json.dumps(compact(value), separators=(",", ":"), ensure_ascii=False, default=str)
+
+    def stats(self) -> dict:
+        with self.lock:
+            calls = list(self.calls)
+        before = sum(tokens for tokens, _ in calls)
+        after = sum(tokens for _, tokens in calls)
+        return {
+            "calls": len(calls),
+            "tokens_before": before,
+            "tokens_after": after,
+            "per_call": calls,
+        }
+
+
+output_encoder = OutputEncoder()
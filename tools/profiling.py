@@ -0,0 +1,257 @@
+import contextlib
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from typing import List, Optional
+
+PROFILE_DIR = os.environ.get("CLOUD_CLI_PROFILE_DIR", "profiles")
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 15
+# From Python 3.12 only one profiler can be active, and it sees every thread
+SINGLE_PROFILER = sys.version_info >= (3, 12)
+
+
+class _PeakRecord:
+    def __init__(self):
+        self.peak = 0
+
+
+class _TurnRecord(_PeakRecord):
+    def __init__(self):
+        super().__init__()
+        self.profiles: List[cProfile.Profile] = []
+        self.snippets: List[str] = []
+
+
+# The turn being profiled in this context. Model requests and tool calls copy
+# the context into their threads; background jobs start without one.
+_current_turn: contextvars.ContextVar = contextvars.ContextVar("profiler_turn", default=None)
+
+
+class Profiler:
+    """Optional cProfile/tracemalloc instrumentation of agent turns and REPL snippets.
+
+    Callers check `enabled` before wrapping anything, so nothing is measured
+    or allocated while profiling is off. Reports are plain text files in
+    `output_dir`, one per turn, laid out so that two runs can be diffed.
+    """
+
+    def __init__(self, output_dir: str = PROFILE_DIR):
+        self.output_dir = output_dir
+        self.enabled = False
+        self.report_count = 0
+        self.lock = threading.Lock()
+        self.last_report: Optional[str] = None
+        # Turns and snippets being measured; tracemalloc keeps a single peak for all of them
+        self.peak_records: List[_PeakRecord] = []
+        # With a single profiler, the profiles started so far; only the last one is enabled
+        self.profile_stack: List[cProfile.Profile] = []
+
+    def enable(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def turn(self, label: str):
+        """Profile one agent turn and write its report, including the snippets it ran."""
+        record = _TurnRecord()
+        token = _current_turn.set(record)
+        self.start_peak(record)
+        before = tracemalloc.take_snapshot()
+        started = time.perf_counter()
+
+        # One profile sees every thread on 3.12+, otherwise each thread adds its own
+        profile = self.start_profile() if SINGLE_PROFILER else None
+        try:
+            with self.thread():
+                yield
+        finally:
+            if profile:
+                self.stop_profile(profile)
+                record.profiles.append(profile)
+            _current_turn.reset(token)
+            elapsed = time.perf_counter() - started
+            peak = self.stop_peak(record)
+            after = tracemalloc.take_snapshot()
+
+            sections = [
+                f"Turn: {label}",
+                f"Wall time: {elapsed:.3f}s",
+                f"Peak traced memory: {peak / 1024:.1f} KB",
+                "",
+                "== Agent process: top functions (cumulative) ==",
+                self.format_stats(record.profiles),
+                "== Agent process: top allocation sites ==",
+                self.format_allocations(self.agent_allocations(before, after)),
+            ]
+            self.write("turn", "\n".join(sections + record.snippets))
+
+    @contextlib.contextmanager
+    def thread(self):
+        """Profile the calling thread as part of the current turn.
+
+        Model requests run on their own threads, so the turn merges one
+        profile per thread. With a single profiler the turn's profile already
+        covers them.
+        """
+        if SINGLE_PROFILER:
+            yield
+            return
+
+        record = _current_turn.get()
+        profile = self.start_profile()
+        try:
+            yield
+        finally:
+            if profile:
+                self.stop_profile(profile)
+                if record:
+                    with self.lock:
+                        record.profiles.append(profile)
+
+    @contextlib.contextmanager
+    def snippet(self, command: str):
+        """Profile one REPL snippet, attached to the current turn or written on its own.
+
+        With a single profiler the turn's profile is paused while the snippet
+        runs, and the snippet's profile also records other threads meanwhile.
+        """
+        record = _current_turn.get()
+        before = tracemalloc.take_snapshot()
+        current, _ = tracemalloc.get_traced_memory()
+        measured = _PeakRecord()
+        self.start_peak(measured)
+        started = time.perf_counter()
+        profile = self.start_profile()
+
+        try:
+            yield
+        finally:
+            if profile:
+                self.stop_profile(profile)
+            elapsed = time.perf_counter() - started
+            peak = self.stop_peak(measured)
+            after = tracemalloc.take_snapshot()
+
+            lines = command.strip().splitlines()
+            sections = [
+                "",
+                f"== Snippet: {lines[0][:80] if lines else ''} ==",
+                f"Wall time: {elapsed:.3f}s",
+                f"Peak memory: {max(peak - current, 0) / 1024:.1f} KB",
+                "-- Top functions (cumulative) --",
+                self.format_stats([profile] if profile else []),
+                "-- Top allocation sites --",
+                self.format_allocations(after.compare_to(before, "lineno")),
+            ]
+            if record:
+                with self.lock:
+                    record.snippets.append("\n".join(sections))
+            else:
+                self.write("snippet", "\n".join(sections).lstrip())
+
+    def start_peak(self, record: _PeakRecord):
+        """Start measuring a peak from now, without losing the peaks already being measured."""
+        with self.lock:
+            _, peak = tracemalloc.get_traced_memory()
+            for other in self.peak_records:
+                other.peak = max(other.peak, peak)
+            tracemalloc.reset_peak()
+            self.peak_records.append(record)
+
+    def stop_peak(self, record: _PeakRecord) -> int:
+        with self.lock:
+            _, peak = tracemalloc.get_traced_memory()
+            self.peak_records.remove(record)
+            return max(record.peak, peak)
+
+    def start_profile(self) -> Optional[cProfile.Profile]:
+        profile = cProfile.Profile()
+        if not SINGLE_PROFILER:
+            profile.enable()
+            return profile
+
+        with self.lock:
+            # Pause the enclosing measurement, e.g. the turn while one of its snippets runs
+            if self.profile_stack:
+                self.profile_stack[-1].disable()
+            try:
+                profile.enable()
+            except ValueError:
+                # Another tool, such as a debugger, holds the profiler
+                if self.profile_stack:
+                    self.profile_stack[-1].enable()
+                return None
+            self.profile_stack.append(profile)
+        return profile
+
+    def stop_profile(self, profile: cProfile.Profile):
+        if not SINGLE_PROFILER:
+            profile.disable()
+            return
+
+        with self.lock:
+            active = self.profile_stack[-1] is profile
+            self.profile_stack.remove(profile)
+            if active:
+                profile.disable()
+                if self.profile_stack:
+                    self.profile_stack[-1].enable()
+
+    @staticmethod
+    def format_stats(profiles: List[cProfile.Profile]) -> str:
+        stream = io.StringIO()
+        try:
+            stats = pstats.Stats(*profiles, stream=stream)
+        except TypeError:
+            return "(no calls recorded)\n"
+        stats.strip_dirs().sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        # Drop the header with total timings so reports line up in a diff
+        lines = stream.getvalue().splitlines()
+        start = next((i for i, line in enumerate(lines) if "ncalls" in line), 0)
+        return "\n".join(lines[start:]) + "\n"
+
+    @staticmethod
+    def agent_allocations(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot):
+        # Snippets are compiled from strings; their allocations are reported per snippet
+        filters = [
+            tracemalloc.Filter(False, "<string>"),
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ]
+        return after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+
+    @staticmethod
+    def format_allocations(differences) -> str:
+        lines = [
+            f"{stat.size_diff / 1024:10.1f} KB {stat.count_diff:+8d} blocks  {stat.traceback[0]}"
+            for stat in differences[:TOP_ALLOCATIONS]
+        ]
+        return "\n".join(lines) + "\n"
+
+    def write(self, kind: str, report: str) -> str:
+        with self.lock:
+            self.report_count += 1
+            number = self.report_count
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.output_dir, f"{timestamp}-{number:04d}-{kind}.txt")
+        with open(path, "w") as f:
+            f.write(report)
+        self.last_report = path
+        return path
+
+
+profiler = Profiler()
@@ -2,16 +2,65 @@ import functools
 import multiprocessing
 import re
 import sys
+import threading
 from io import StringIO
 from typing import Dict, Optional
 
-from pydantic import BaseModel, Field
+import numpy as np
+from pydantic import BaseModel, Field, PrivateAttr
+
+from tools.aws_rate_limiter import aws_rate_limiter
+from tools.frames import ResultFrame, paginate_frame
+from tools.metrics import fetch_metrics
+from tools.namespace_memory import NamespaceMemory
+from tools.profiling import profiler
+
+class ThreadStdout:
+    """Sends writes to a per-thread capture buffer, falling back to the real stdout.
+
+    Lets snippets run on several threads at once without capturing each
+    other's output or the terminal's.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def capture(self, buffer: Optional[StringIO]):
+        self.local.buffer = buffer
+
+    def write(self, text):
+        return (getattr(self.local, "buffer", None) or self.stream).write(text)
+
+    def flush(self):
+        return (getattr(self.local, "buffer", None) or self.stream).flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+_stdout_lock = threading.Lock()
+
+def thread_stdout() -> ThreadStdout:
+    with _stdout_lock:
+        if not isinstance(sys.stdout, ThreadStdout):
+            sys.stdout = ThreadStdout(sys.stdout)
+        return sys.stdout
+
+# Helpers every REPL namespace starts with, described to the model in tools.py
+PRELOADED = {
+    "np": np,
+    "paginate_frame": paginate_frame,
+    "ResultFrame": ResultFrame,
+    "fetch_metrics": fetch_metrics,
+}
 
 class python_repl(BaseModel):
     """Simulates a standalone Python REPL."""
 
-    globals: Optional[Dict] = Field(default_factory=dict, alias="_globals")  # type: ignore[arg-type]
+    globals: Optional[Dict] = Field(default_factory=lambda: dict(PRELOADED), alias="_globals")  # type: ignore[arg-type]
     locals: Optional[Dict] = Field(default_factory=dict, alias="_locals")  # type: ignore[arg-type]
+    _memory: NamespaceMemory = PrivateAttr(default_factory=NamespaceMemory)
+    _last_run_ok: bool = PrivateAttr(default=False)
 
     @staticmethod
     def sanitize_input(query: str) -> str:
@@ -37,25 +86,65 @@ class python_repl(BaseModel):
         globals: Optional[Dict],
         locals: Optional[Dict],
         queue: multiprocessing.Queue,
-    ) -> None:
-        old_stdout = sys.stdout
-        sys.stdout = mystdout = StringIO()
+    ) -> bool:
+        mystdout = StringIO()
+        stdout = thread_stdout()
+        stdout.capture(mystdout)
         try:
             cleaned_command = cls.sanitize_input(command)
-            exec(cleaned_command, globals, locals)
-            sys.stdout = old_stdout
+            if profiler.enabled:
+                with profiler.snippet(cleaned_command):
+                    exec(cleaned_command, globals, locals)
+            else:
+                exec(cleaned_command, globals, locals)
             queue.put(mystdout.getvalue())
+            return True
         except Exception as e:
-            sys.stdout = old_stdout
             queue.put(repr(e))
+            return False
+        finally:
+            # Also on KeyboardInterrupt, or everything printed afterwards would be lost
+            stdout.capture(None)
 
     def run(self, command: str, modifies_resource: str,modified_resource_name: str =  None) -> str:
         """Run command with own globals/locals and returns anything printed."""
 
         queue: multiprocessing.Queue = multiprocessing.Queue()
+        # Clients created by the snippet share rate limits with every other snippet
+        aws_rate_limiter.install()
        
-        self.worker(command, self.globals, self.locals, queue)
+        self._last_run_ok = self.worker(command, self.globals, self.locals, queue)
+        output = queue.get()
+
+        evicted = self._memory.update(
+            [self.globals, self.locals],
+            NamespaceMemory.referenced_names(self.sanitize_input(command))
+        )
+        if evicted:
+            output += f"\n[REPL memory limit reached, removed unused variables: {', '.join(evicted)}]"
+
+        return output
+
+    def last_run_succeeded(self) -> bool:
+        return self._last_run_ok
+
+    def memory_stats(self) -> Dict:
+        return {
+            "variables": len(self._memory.sizes),
+            "used_bytes": self._memory.total(),
+            "limit_bytes": self._memory.limit_bytes,
+            "evicted_count": self._memory.evicted_count,
+            "evicted_bytes": self._memory.evicted_bytes,
+        }
+
+    def namespace_usage(self):
+        return self._memory.usage()
 
-        return queue.get()
+    def reset(self):
+        """Drop every variable defined in the REPL."""
+        self.globals.clear()
+        self.globals.update(PRELOADED)
+        self.locals.clear()
+        self._memory.reset()
 
 run_python_code = python_repl()
\ No newline at end of file
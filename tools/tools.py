@@ -9,7 +9,30 @@ tools = [
             "properties": {
                 "command": {
                 "type": "string",
-                "description": "A string of Python code to execute in a REPL environment."
+                "description": """
+                    A string of Python code to execute in a REPL environment.
+
+                    Preloaded helpers (no import needed):
+                    - `np`: NumPy.
+                    - `paginate_frame(client, "describe_volumes", columns=["VolumeId", "Size", "Tags"], regions=None, result_path=None, **params)`:
+                      drains a boto3 paginator into a columnar `ResultFrame`. Pass `columns` to keep only the fields needed
+                      (nested fields are dotted, e.g. "State.Name"; tags become "Tags.<Key>") and `regions` to page several
+                      regions in parallel (adds a "Region" column). describe_instances gives one row per instance; operations with
+                      several result keys (e.g. list_objects_v2: Contents and CommonPrefixes) add a "ResultKey" column, and
+                      `result_path="Reservations[].Instances[]"` picks the records with a JMESPath expression instead.
+                      Prefer it over building lists of dicts for large listings.
+                    - `ResultFrame` methods: `frame["Size"]` (NumPy array), `filter(mask, Column=value_or_list)`,
+                      `group_by("VolumeType", Size="sum")` (count/sum/mean/min/max), `top("Size", k=10, smallest=False)`,
+                      `sort(column, descending=False)`, `select(*columns)`, `head(n)`, `to_records(limit)`, `len(frame)`.
+                      `print(frame)` prints a compact per-column summary; `ResultFrame.from_records(list_of_dicts)` builds one.
+                    - `fetch_metrics(cloudwatch_client, "AWS/EC2", "CPUUtilization", "InstanceId", instance_ids, start=timedelta(days=7), period=3600, stat="Average", dimensions=None)`:
+                      fetches one metric for a whole fleet in batched GetMetricData calls (500 resources per request, fetched
+                      concurrently) in a single tool call. Never loop over get_metric_statistics per resource.
+                      Returns a `MetricMatrix`: `.values` (resources x timestamps, NaN where missing), `.resource_ids`, `.timestamps`,
+                      per-resource `mean()`, `max()`, `percentile(95)`, `fraction_above(80)`, `below(5, how="mean")` / `above(80, how="p95")`
+                      (resource IDs), `missing()`, `to_frame("mean", "p95", "max")` (a ResultFrame). `print(matrix)` prints a summary.
+                      A list of metric names returns a dict of matrices keyed by name.
+                """
                 },
                 "modifies_resource": {
                 "type": "string",
@@ -0,0 +1,83 @@
+import bisect
+import queue
+import re
+import threading
+from typing import Iterable, List
+
+from prompt_toolkit.completion import Completer, Completion
+
+# AWS resource IDs (i-0abc..., vol-..., sg-...) and ARNs
+ID_RE = re.compile(r"arn:aws[\w-]*:[^\s'\",\]}]+|\b[a-z]{1,12}-[0-9a-f]{8,17}\b")
+# Values of the usual name/identifier keys in boto3 responses
+NAME_RE = re.compile(
+    r"['\"](?:\w*Name|\w*Identifier|\w*Id|QueueUrl)['\"]\s*:\s*['\"]([^'\"\s]{2,255})['\"]"
+)
+WORD_RE = re.compile(r"[\w\-:/.]+")
+
+MIN_PREFIX = 2
+MAX_COMPLETIONS = 50
+
+
+def extract_identifiers(text: str) -> set:
+    return set(ID_RE.findall(text)) | set(NAME_RE.findall(text))
+
+
+class PrefixIndex:
+    """Sorted, case-insensitive word list searched by binary search."""
+
+    def __init__(self):
+        self.entries: List[tuple] = []
+        self.known = set()
+        self.lock = threading.Lock()
+
+    def add(self, words: Iterable[str]):
+        with self.lock:
+            new = sorted((word.lower(), word) for word in set(words) - self.known)
+            if not new:
+                return
+            self.known.update(word for _, word in new)
+            # Swap in a new list so readers never see a half-merged one
+            self.entries = sorted(self.entries + new)
+
+    def search(self, prefix: str, limit: int = MAX_COMPLETIONS) -> List[str]:
+        entries = self.entries
+        key = prefix.lower()
+        matches = []
+        for i in range(bisect.bisect_left(entries, (key,)), len(entries)):
+            lowered, word = entries[i]
+            if not lowered.startswith(key) or len(matches) >= limit:
+                break
+            matches.append(word)
+        return matches
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class ResourceCompleter(Completer):
+    """Completes resource IDs and names seen in tool output and REPL variables.
+
+    Output is scanned on a background thread so large results never slow the prompt.
+    """
+
+    def __init__(self):
+        self.index = PrefixIndex()
+        self.pending = queue.Queue()
+        threading.Thread(target=self._index_worker, daemon=True).start()
+
+    def feed(self, text: str, names: Iterable[str] = ()):
+        self.pending.put((text, list(names)))
+
+    def _index_worker(self):
+        while True:
+            text, names = self.pending.get()
+            self.index.add(extract_identifiers(text) | set(names))
+
+    def get_completions(self, document, complete_event):
+        word = document.get_word_before_cursor(pattern=WORD_RE)
+        if len(word) < MIN_PREFIX:
+            return
+
+        for match in self.index.search(word):
+            if match != word:
+                yield Completion(match, start_position=-len(word))
@@ -2,15 +2,25 @@ from rich.markdown import Markdown
 from rich.console import Console
 from rich.panel import Panel
 from rich.syntax import Syntax
+from rich.table import Table
 from rich.text import Text
 from prompt_toolkit.styles import Style
-from prompt_toolkit import prompt
+from prompt_toolkit import prompt, PromptSession
+from prompt_toolkit.completion import ThreadedCompleter
+from prompt_toolkit.history import FileHistory
+from ui.completion import ResourceCompleter
+import os
 import textwrap
 
+HISTORY_FILE = os.environ.get("CLOUD_CLI_HISTORY", os.path.expanduser("~/.cloud_cli_ai_history"))
+
 class UI:
     def __init__(self, console: Console):
         self.console = console
         self.style = Style.from_dict({'prompt': 'orange'})
+        self.completer = ResourceCompleter()
+        self.session = None
+        self.draft = ""
         
     def display_welcome(self):
         markdown_text = textwrap.dedent("""
@@ -20,6 +30,13 @@ class UI:
 
         Type `--provider [openai|ollama]` to switch provider.  
         Type `--model [MODEL NAME]` to change the model.  
+        Type `--hedge [openai|ollama|groq] [SECONDS]` to race slow requests against a second provider, `--hedge off` to stop.  
+        Type `--timeout [SECONDS]` to set the model timeout.  
+        Type `--stats` to show session stats, `--profile` to toggle per-turn CPU and memory profiling.  
+        Type `--vars` to list REPL variables, `--reset` to clear them.  
+        Type `--watch [SECONDS]` to re-run the last read-only command, `--interpret [QUESTION]` to ask about its output.  
+        Start a question with `&` to run it in the background, `--jobs` to list jobs, `--job [ID]` to show a result.  
+        Press `Tab` to complete resource IDs and names seen so far.  
         Type `exit` to quit.
 
         How can I help you today?
@@ -27,8 +44,32 @@ class UI:
 
         self.console.print(Markdown(markdown_text))
 
-    def get_user_input(self) -> str:
-        return prompt("\n>> ", style=self.style).strip()
+    def get_user_input(self, toolbar=None, pre_run=None) -> str:
+        # Built once so history and completions survive across turns
+        if self.session is None:
+            self.session = PromptSession(
+                history=FileHistory(HISTORY_FILE),
+                completer=ThreadedCompleter(self.completer),
+                complete_while_typing=True,
+                style=self.style,
+                refresh_interval=1
+            )
+        text = self.session.prompt("\n>> ", bottom_toolbar=toolbar, default=self.draft, pre_run=pre_run)
+        self.draft = ""
+        return (text or "").strip()
+
+    def interrupt_input(self):
+        """Make a waiting get_user_input() return "" now; what was typed is offered again next time."""
+        app = self.session.app if self.session else None
+        if app is None or not app.is_running:
+            return
+
+        def stop():
+            if app.is_running:
+                self.draft = app.current_buffer.text
+                app.exit(result=None)
+
+        app.loop.call_soon_threadsafe(stop)
 
     def display_message(self, message: str, color: str = "grey"): 
         self.console.print(f"[{color}]{message}[/{color}]")
@@ -43,6 +84,14 @@ class UI:
         self.console.print(formatted)
         self.console.print()
 
+    def display_table(self, title: str, columns: list, rows: list):
+        table = Table(title=title, title_justify="left", border_style="cyan")
+        for column in columns:
+            table.add_column(column)
+        for row in rows:
+            table.add_row(*[str(value) for value in row])
+        self.console.print(table)
+
     def display_markdown(self, md: str):
         self.console.print(Markdown(md))
 
@@ -50,9 +99,13 @@ class UI:
         syntax = Syntax(code, language, theme="monokai", line_numbers=True)
         self.console.print(syntax)
 
-    def confirm_modification(self, resource_name: str) -> str:
+    def display_diff(self, diff: str):
+        self.console.print(Syntax(diff, "diff", theme="monokai"))
+
+    def confirm_modification(self, resource_name: str, context: str = None) -> str:
         self.console.print(
             Panel.fit(
+                (f"{context}\n\n" if context else "") +
                 f"[bold yellow]{resource_name}[/bold yellow] will be modified.\n"
                 "Do you want to proceed?\n\n"
                 "[bold]1)[/bold] Yes\n"